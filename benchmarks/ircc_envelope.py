@@ -0,0 +1,52 @@
+"""
+Per-command CPU cost of building the IRCC SOAP envelope.
+
+Compares the ElementTree construction previously done by send_req_ircc on
+every keypress with the cached template used now.
+
+    python benchmarks/ircc_envelope.py
+"""
+import os
+import sys
+import timeit
+from xml.etree.ElementTree import Element, SubElement, tostring
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from braviarc.braviarc import ircc_body_build  # noqa: E402
+
+CODES = ['AAAAAQAAAAEAAAASAw==', 'AAAAAQAAAAEAAAATAw==',
+         'AAAAAQAAAAEAAAAUAw==', 'AAAAAgAAAJcAAABgAw==']
+
+
+def elementtree_body_build(code):
+    root = Element('s:Envelope',
+                   {"xmlns:s": "http://schemas.xmlsoap.org/soap/envelope/",
+                    "s:encodingStyle":
+                        "http://schemas.xmlsoap.org/soap/encoding/"})
+    body = SubElement(root, "s:Body")
+    sendIRCC = SubElement(body, "u:X_SendIRCC",
+                          {"xmlns:u": "urn:schemas-sony-com:service:IRCC:1"})
+    irccCode = SubElement(sendIRCC, "IRCCCode")
+    irccCode.text = code
+    return tostring(root, encoding='utf8')
+
+
+def bench(function, number=20000):
+    timer = timeit.Timer(lambda: [function(code) for code in CODES])
+    best = min(timer.repeat(repeat=5, number=number // len(CODES)))
+    return best / number * 1e6
+
+
+def main():
+    for code in CODES:
+        assert elementtree_body_build(code) == ircc_body_build(code)
+    before = bench(elementtree_body_build)
+    after = bench(ircc_body_build)
+    print("ElementTree envelope: {:8.2f} us/command".format(before))
+    print("cached template:      {:8.2f} us/command".format(after))
+    print("speedup:              {:8.1f}x".format(before / after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+End-to-end latency and throughput against FakeBraviaDevice.
+
+    python benchmarks/latency.py --latency 0.005 --channels 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from braviarc.braviarc import BraviaRC  # noqa: E402
+from braviarc.fake_device import FakeBraviaDevice  # noqa: E402
+from braviarc.fleet import BraviaFleet  # noqa: E402
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+    return samples[index]
+
+
+def measure(function, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(name, samples):
+    print("{:<22} {:>8.2f} {:>8.2f} {:>8.2f} {:>8.2f}".format(
+        name, *(percentile(samples, fraction) * 1000
+                for fraction in (0.5, 0.9, 0.99, 1.0))))
+
+
+def bench_calls(args):
+    print("{:<22} {:>8} {:>8} {:>8} {:>8}  (ms)".format(
+        'call', 'p50', 'p90', 'p99', 'max'))
+    with FakeBraviaDevice(psk='0000', channels=args.channels,
+                          latency=args.latency) as device, \
+            BraviaRC(device.host, psk='0000', response_cache=False) as tv:
+        tv.connect(None, 'bench', 'bench')
+        calls = [
+            ('bravia_req_json', tv.get_power_status),
+            ('get_state', tv.get_state),
+            ('send_req_ircc', lambda: tv.send_command('VolumeUp')),
+            ('load_app_list', tv.load_app_list),
+            ('load_source_list', lambda: tv.load_source_list(refresh=True)),
+        ]
+        for name, function in calls:
+            function()
+            iterations = args.iterations
+            if name == 'load_source_list':
+                iterations = max(1, iterations // 10)
+            report(name, measure(function, iterations))
+
+
+def bench_fleet(args):
+    devices = [FakeBraviaDevice(latency=args.latency)
+               for _ in range(args.fleet_size)]
+    for device in devices:
+        device.start()
+    try:
+        # round trips, not cached responses
+        with BraviaFleet([BraviaRC(device.host, raise_errors=True,
+                                   response_cache=False)
+                          for device in devices],
+                         max_workers=args.fleet_size) as fleet:
+            fleet.get_power_status()
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                results = fleet.get_power_status()
+                assert all(result.ok for result in results.values())
+            elapsed = time.perf_counter() - start
+    finally:
+        for device in devices:
+            device.stop()
+    calls = args.rounds * args.fleet_size
+    print("fleet of {} TVs: {} calls in {:.2f}s, {:.0f} calls/s".format(
+        args.fleet_size, calls, elapsed, calls / elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--latency', type=float, default=0.002,
+                        help='fake device latency per request in seconds')
+    parser.add_argument('--channels', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--fleet-size', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+    bench_calls(args)
+    bench_fleet(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Import time, peak RSS and round trips of the requests and http.client
+transports, each measured in fresh interpreters against FakeBraviaDevice.
+
+    python benchmarks/transport.py --runs 5 --iterations 200
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from braviarc.fake_device import FakeBraviaDevice  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# run by a fresh interpreter: transport host iterations
+CHILD = """
+import json, resource, sys, time
+transport, host, iterations = sys.argv[1], sys.argv[2], int(sys.argv[3])
+report = {'import': 0, 'create': 0, 'samples': []}
+if transport != 'none':
+    start = time.perf_counter()
+    from braviarc.braviarc import BraviaRC
+    report['import'] = time.perf_counter() - start
+    start = time.perf_counter()
+    tv = BraviaRC(host, psk='0000', transport=transport,
+                  response_cache=False, circuit_breaker=False)
+    report['create'] = time.perf_counter() - start
+    for _ in range(iterations):
+        start = time.perf_counter()
+        tv.get_power_status()
+        report['samples'].append(time.perf_counter() - start)
+    tv.close()
+report['rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+report['requests'] = 'requests' in sys.modules
+print(json.dumps(report))
+"""
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+    return samples[index]
+
+
+def run_child(transport, host, iterations):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [ROOT] + [path for path in [env.get('PYTHONPATH')] if path])
+    output = subprocess.check_output(
+        [sys.executable, '-c', CHILD, transport, host, str(iterations)],
+        env=env)
+    return json.loads(output.decode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--runs', type=int, default=5,
+                        help='interpreters started per transport')
+    parser.add_argument('--iterations', type=int, default=200,
+                        help='getPowerStatus round trips per interpreter')
+    args = parser.parse_args()
+
+    print("{:<12} {:>10} {:>10} {:>9} {:>8} {:>8}  {}".format(
+        'transport', 'import ms', 'create ms', 'RSS MiB', 'p50 ms',
+        'p99 ms', 'requests imported'))
+    with FakeBraviaDevice(psk='0000') as device:
+        for transport in ('none', 'http.client', 'requests'):
+            reports = [run_child(transport, device.host, args.iterations)
+                       for _ in range(args.runs)]
+            samples = [sample for report in reports
+                       for sample in report['samples']]
+            print("{:<12} {:>10.1f} {:>10.1f} {:>9.1f} {:>8} {:>8}  {}".format(
+                transport,
+                percentile([report['import'] for report in reports],
+                           0.5) * 1000,
+                percentile([report['create'] for report in reports],
+                           0.5) * 1000,
+                # ru_maxrss is in KiB on Linux
+                percentile([report['rss'] for report in reports],
+                           0.5) / 1024.0,
+                '{:.2f}'.format(percentile(samples, 0.5) * 1000)
+                if samples else '-',
+                '{:.2f}'.format(percentile(samples, 0.99) * 1000)
+                if samples else '-',
+                reports[0]['requests']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,549 @@
+"""
+Sony Bravia RC API for asyncio
+
+Requires aiohttp (pip install braviarc[async]).
+"""
+import asyncio
+import logging
+import time
+
+import aiohttp
+
+from .apps import APP_LIST_TTL, AppCatalogue
+from .braviarc import (BraviaRCBase, BraviaState, COMMAND_TTL, KeyTiming,
+                       EXT_INPUT_SOURCES, POOL_MAXSIZE, POWER_UNREACHABLE,
+                       TIMEOUT, TV_SOURCES, WAKE_POLL_INTERVAL,
+                       WAKE_POLL_TIMEOUT, WAKEUP_CODE, WOL_BURST,
+                       ircc_body_build)
+from .models import PlayingInfo
+from .policy import DEFAULT_DEADLINES
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def create_session(pool_connections=100, pool_maxsize=POOL_MAXSIZE):
+    """Create an aiohttp session that can be shared by several
+       AsyncBraviaRC instances.
+
+       pool_connections caps the total number of open connections and
+       pool_maxsize the number of connections per host. It must be called
+       from a running event loop.
+    """
+    connector = aiohttp.TCPConnector(limit=pool_connections,
+                                     limit_per_host=pool_maxsize)
+    return aiohttp.ClientSession(connector=connector)
+
+
+class AsyncBraviaRC(BraviaRCBase):
+
+    def __init__(self, host, psk=None, mac=None, session=None,
+                 pool_maxsize=POOL_MAXSIZE, timeouts=None, semaphore=None,
+                 command_cache=None, command_ttl=COMMAND_TTL,
+                 session_store=None, app_list_ttl=APP_LIST_TTL):
+        """Initialize the asyncio Sony Bravia RC class.
+
+           The arguments are the same as for BraviaRC. session is an
+           aiohttp.ClientSession (see create_session) and semaphore an
+           asyncio.Semaphore bounding the number of in-flight requests; pass
+           the same ones to many instances to drive a whole fleet with
+           bounded concurrency. Without them the instance creates its own,
+           limited to pool_maxsize.
+        """
+        super(AsyncBraviaRC, self).__init__(host, psk, mac, command_cache,
+                                            command_ttl, session_store)
+        self._owns_session = session is None
+        self._session = session
+        self._pool_maxsize = pool_maxsize
+        self._timeouts = dict(timeouts or {})
+        self._semaphore = semaphore
+        self._apps = AppCatalogue(app_list_ttl)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Close the HTTP session if it is owned by this instance."""
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request(self, method, path, endpoint=None, **kwargs):
+        """Send an HTTP request to the TV.
+
+           Returns the response and its body, endpoint selects the timeout.
+        """
+        if endpoint is None:
+            endpoint = path
+        session = self._get_session()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._pool_maxsize)
+        timeout = aiohttp.ClientTimeout(
+            total=self._timeouts.get(endpoint, TIMEOUT))
+        url = 'http://{}/{}'.format(self._host, path)
+        async with self._semaphore:
+            async with session.request(method, url, timeout=timeout,
+                                       **kwargs) as response:
+                content = await response.read()
+        return response, content
+
+    def _get_session(self):
+        if self._session is None:
+            self._session = create_session(self._pool_maxsize,
+                                           self._pool_maxsize)
+        return self._session
+
+    async def ws_connect(self, path, **kwargs):
+        """Open a WebSocket to a service of the TV, e.g. 'sony/system'.
+
+           The PSK and auth cookie are sent like for HTTP requests.
+        """
+        headers = dict(self._headers)
+        if self._cookies:
+            headers['Cookie'] = '; '.join(
+                '{}={}'.format(key, value)
+                for key, value in self._cookies.items())
+        url = 'ws://{}/{}'.format(self._host, path)
+        return await self._get_session().ws_connect(url, headers=headers,
+                                                    **kwargs)
+
+    async def connect(self, pin, clientid, nickname):
+        """Connect to TV and get authentication cookie.
+
+        See BraviaRC.connect.
+        """
+        authorization = self._auth_jdata_build(clientid, nickname)
+
+        auth = None
+
+        if pin:
+            auth = aiohttp.BasicAuth('', pin)
+
+        try:
+            response, content = await self._request(
+                'POST', 'sony/accessControl', data=authorization, auth=auth)
+            response.raise_for_status()
+
+        except aiohttp.ClientResponseError as exception_instance:
+            _LOGGER.error("[W] HTTPError: " + str(exception_instance))
+            return False
+
+        except asyncio.TimeoutError as exception_instance:
+            _LOGGER.error("[W] Timeout occurred: " + str(exception_instance))
+            return False
+
+        except Exception as exception_instance:  # pylint: disable=broad-except
+            _LOGGER.error("[W] Exception: " + str(exception_instance))
+            return False
+
+        else:
+            resp = self._decode_json(content)
+            if resp is None or not resp.get('error'):
+                self._remember_session(
+                    {key: morsel.value for key, morsel
+                     in response.cookies.items()}, clientid, nickname)
+                return True
+
+        return False
+
+    async def send_req_ircc(self, params, log_errors=True):
+        """Send an IRCC command via HTTP to Sony Bravia."""
+        xml_str = ircc_body_build(params)
+
+        try:
+            response, content = await self._request(
+                'POST', 'sony/IRCC', headers=self._ircc_headers,
+                cookies=self._cookies, data=xml_str)
+        except asyncio.TimeoutError as exception_instance:
+            if log_errors:
+                _LOGGER.error("Timeout occurred: " + str(exception_instance))
+
+        except Exception as exception_instance:  # pylint: disable=broad-except
+            if log_errors:
+                _LOGGER.error("Exception: " + str(exception_instance))
+        else:
+            return content
+
+    async def bravia_req_json(self, url, params, log_errors=True):
+        """ Send request command via HTTP json to Sony Bravia."""
+        try:
+            response, content = await self._request(
+                'POST', url, data=params.encode("UTF-8"),
+                cookies=self._cookies, headers=self._headers)
+
+        except Exception as exception_instance:  # pylint: disable=broad-except
+            if log_errors:
+                _LOGGER.error("Exception: " + str(exception_instance))
+
+        else:
+            return self._decode_json(content)
+
+    async def send_command(self, command):
+        """Sends a command to the TV."""
+        await self.send_req_ircc(await self.get_command_code(command))
+
+    async def _send_key(self, name, code):
+        start = time.monotonic()
+        ok = await self.send_req_ircc(code) is not None
+        return KeyTiming(name, code, start, time.monotonic() - start, ok)
+
+    async def send_sequence(self, keys, interval_ms=100, pipeline=False,
+                            max_in_flight=4):
+        """Send a sequence of remote controller commands.
+
+           See BraviaRC.send_sequence.
+        """
+        if self._commands_expired():
+            await self._refresh_commands()
+        sequence = self._expand_sequence(keys)
+        interval = interval_ms / 1000.0
+        next_time = time.monotonic()
+
+        if not pipeline:
+            timings = []
+            for name, code in sequence:
+                await asyncio.sleep(max(0, next_time - time.monotonic()))
+                next_time = time.monotonic() + interval
+                timings.append(await self._send_key(name, code))
+            return timings
+
+        in_flight = asyncio.BoundedSemaphore(max_in_flight)
+
+        async def send(name, code):
+            try:
+                return await self._send_key(name, code)
+            finally:
+                in_flight.release()
+
+        tasks = []
+        for name, code in sequence:
+            await asyncio.sleep(max(0, next_time - time.monotonic()))
+            await in_flight.acquire()
+            next_time = time.monotonic() + interval
+            tasks.append(asyncio.ensure_future(send(name, code)))
+        return list(await asyncio.gather(*tasks))
+
+    async def get_source(self, source):
+        """Returns list of Sources"""
+        original_content_list = []
+        content_index = 0
+        while True:
+            payload = {"source": source, "stIdx": content_index}
+            resp = await self.bravia_req_json(
+                "sony/avContent", self._jdata_build("getContentList", payload))
+            content_list = self._parse_content_list(resp)
+            if not content_list:
+                break
+            content_index = content_list[-1].index + 1
+            original_content_list.extend(content_list)
+        return original_content_list
+
+    async def _get_ext_input(self, result):
+        resp = await self.bravia_req_json(
+            "sony/avContent", self._jdata_build("getContentList", result))
+        return self._parse_content_list(resp) or []
+
+    async def load_source_list(self):
+        """ Load source list from Sony Bravia.
+
+            Every source is fetched concurrently.
+        """
+        tv_resp, ext_resp, app_resp = await asyncio.gather(
+            self.bravia_req_json("sony/avContent",
+                                 self._jdata_build("getSourceList",
+                                                   {"scheme": "tv"})),
+            self.bravia_req_json("sony/avContent",
+                                 self._jdata_build("getSourceList",
+                                                   {"scheme": "extInput"})),
+            self.bravia_req_json("sony/appControl",
+                                 self._jdata_build("getApplicationList",
+                                                   None)))
+
+        coroutines = [self.get_source(result['source']) for result
+                      in self._parse_source_list(tv_resp, TV_SOURCES)]
+        coroutines.extend(self._get_ext_input(result) for result
+                          in self._parse_source_list(ext_resp,
+                                                     EXT_INPUT_SOURCES))
+
+        original_content_list = []
+        for content_list in await asyncio.gather(*coroutines):
+            original_content_list.extend(content_list)
+        original_content_list.extend(
+            self._parse_application_list(app_resp) or [])
+
+        return self._build_content_mapping(original_content_list)
+
+    async def get_playing_info(self):
+        """Get information on program that is shown on TV."""
+        resp = await self.bravia_req_json(
+            "sony/avContent", self._jdata_build("getPlayingContentInfo"))
+        return self._parse_playing_info(resp)
+
+    async def get_playback_clock(self):
+        """Get the PlaybackClock of the programme shown, None without one.
+
+        See BraviaRC.get_playback_clock.
+        """
+        if self._clock_stale():
+            await self.get_playing_info()
+        return self._clock
+
+    async def get_system_info(self):
+        """Get info on TV."""
+        resp = await self.bravia_req_json(
+            "sony/system", self._jdata_build("getSystemInformation"))
+        return self._parse_system_info(resp)
+
+    async def get_network_info(self):
+        """Get info on network."""
+        resp = await self.bravia_req_json(
+            "sony/system", self._jdata_build("getNetworkSettings"))
+        network_info = self._parse_network_info(resp)
+        self._remember_network_info(network_info)
+        return network_info
+
+    async def get_power_status(self):
+        """Get power status: off, active, standby.
+           By default the TV is turned off."""
+        power_status = await self._query_power_status()
+        if power_status == POWER_UNREACHABLE:
+            return 'off'
+        return power_status
+
+    async def _query_power_status(self):
+        """Get power status, POWER_UNREACHABLE if the TV does not answer."""
+        resp = await self.bravia_req_json(
+            "sony/system", self._jdata_build("getPowerStatus"), False)
+        if resp is None:
+            return POWER_UNREACHABLE
+        return self._parse_power_status(resp)
+
+    async def get_state(self):
+        """Get power status, playing info and volume info at once.
+
+           See BraviaRC.get_state.
+        """
+        if self._last_power_status == 'active':
+            power_status, playing, volume = await asyncio.gather(
+                self._query_power_status(), self.get_playing_info(),
+                self.get_volume_info())
+        else:
+            power_status = await self._query_power_status()
+            if power_status == 'active':
+                playing, volume = await asyncio.gather(
+                    self.get_playing_info(), self.get_volume_info())
+        self._last_power_status = power_status
+
+        if power_status != 'active':
+            return BraviaState(power_status, PlayingInfo(), None)
+        return BraviaState(power_status, playing, volume)
+
+    async def _refresh_commands(self):
+        system_info = None
+        resp = self.bravia_req_json(
+            "sony/system", self._jdata_build("getRemoteControllerInfo", None))
+        if self._command_cache is not None:
+            system_info, resp = await asyncio.gather(self.get_system_info(),
+                                                     resp)
+        else:
+            resp = await resp
+        self._update_commands(self._parse_commands(resp), system_info)
+
+    async def get_command_code(self, command_name):
+        if self._commands_expired():
+            await self._refresh_commands()
+        return self._commands.get(command_name)
+
+    async def get_volume_info(self):
+        """Get volume info."""
+        resp = await self.bravia_req_json(
+            "sony/audio", self._jdata_build("getVolumeInformation", None))
+        return self._parse_volume_info(resp)
+
+    async def set_volume_level(self, volume):
+        """Set volume level, range 0..1."""
+        return await self.bravia_req_json("sony/audio",
+                                          self._volume_jdata_build(volume))
+
+    async def set_mute(self, mute):
+        """Mute or unmute the speakers."""
+        return await self.bravia_req_json("sony/audio",
+                                          self._mute_jdata_build(mute))
+
+    async def load_apps(self, refresh=False, log_errors=True):
+        """Get the AppCatalogue of the apps of the DIAL app list.
+
+           It is fetched again once older than app_list_ttl or with
+           refresh, a list that cannot be fetched keeps its previous apps.
+        """
+        if not refresh and not self._apps.expired():
+            return self._apps
+        try:
+            response, content = await self._request(
+                'GET', 'DIAL/sony/applist', cookies=self._auth_cookie(),
+                headers=self._headers)
+        except Exception as exception_instance:  # pylint: disable=broad-except
+            if log_errors:
+                _LOGGER.error("Exception: " + str(exception_instance))
+        else:
+            self._apps.update(self._apps.parse_dial(content), None)
+        return self._apps
+
+    async def load_app_list(self, log_errors=True):
+        """Get the list of installed apps"""
+        return dict((app.title, app.dial_id) for app in
+                    await self.load_apps(refresh=True, log_errors=log_errors))
+
+    async def start_app(self, app_name, log_errors=True):
+        """Start an app by name.
+
+        See BraviaRC.start_app.
+        """
+        refreshed = self._apps.expired()
+        apps = await self.load_apps(log_errors=log_errors)
+        app = apps.get(app_name)
+        if app is None and not refreshed:
+            apps = await self.load_apps(refresh=True, log_errors=log_errors)
+            app = apps.get(app_name)
+        if app is None:
+            app = apps.find(app_name)
+        if app is not None:
+            return await self._start_app(app.dial_id, log_errors=log_errors)
+
+    async def _start_app(self, app_id, log_errors=True):
+        """Start an app by id"""
+        try:
+            response, content = await self._request(
+                'POST', 'DIAL/apps/{}'.format(app_id), endpoint='DIAL/apps',
+                cookies=self._auth_cookie(), headers=self._headers)
+        except Exception as exception_instance:  # pylint: disable=broad-except
+            if log_errors:
+                _LOGGER.error("Exception: " + str(exception_instance))
+        else:
+            return content
+
+    async def _send_power_on(self):
+        """Ask a TV in network standby to power on, True if it answered."""
+        command = self._commands.get('WakeUp', WAKEUP_CODE)
+        results = await asyncio.gather(
+            self.bravia_req_json("sony/system",
+                                 self._jdata_build("setPowerStatus",
+                                                   {"status": True}), False),
+            self.send_req_ircc(command, False))
+        return any(result is not None for result in results)
+
+    async def _poll_power_status(self):
+        try:
+            return await asyncio.wait_for(self._query_power_status(),
+                                          WAKE_POLL_TIMEOUT)
+        except asyncio.TimeoutError:
+            return POWER_UNREACHABLE
+
+    async def turn_on(self, poll_interval=WAKE_POLL_INTERVAL,
+                      timeout=DEFAULT_DEADLINES['turn_on']):
+        """Turn the media player on and wait until it is active.
+
+           See BraviaRC.turn_on, timeout bounds the whole call. Returns the
+           seconds it took the TV to be active, or None after timeout.
+        """
+        start = time.monotonic()
+        end = start + timeout
+        power_on = None
+        try:
+            while True:
+                try:
+                    self._wakeonlan(WOL_BURST)
+                except OSError as exception_instance:
+                    _LOGGER.debug("Wake-on-LAN failed: %s",
+                                  exception_instance)
+                if power_on is None or (power_on.done() and
+                                        not power_on.result()):
+                    power_on = asyncio.ensure_future(self._send_power_on())
+                # poll right after a TV in network standby answered
+                await asyncio.wait([power_on], timeout=WAKE_POLL_TIMEOUT)
+                if await self._poll_power_status() == 'active':
+                    self._last_power_status = 'active'
+                    return time.monotonic() - start
+                if time.monotonic() + poll_interval >= end:
+                    return None
+                await asyncio.sleep(poll_interval)
+        finally:
+            if power_on is not None:
+                power_on.cancel()
+
+    async def turn_on_command(self):
+        """Turn the media player on using command.
+
+            Only confirmed working on Android."""
+        if await self.get_power_status() != 'active':
+            await self.send_req_ircc(await self.get_command_code('TvPower'))
+            await self.bravia_req_json(
+                "sony/system",
+                self._jdata_build("setPowerStatus", {"status": "true"}))
+
+    async def turn_off(self):
+        """Turn off media player."""
+        await self.send_command('PowerOff')
+
+    async def volume_up(self):
+        """Volume up the media player."""
+        await self.send_command('VolumeUp')
+
+    async def volume_down(self):
+        """Volume down media player."""
+        await self.send_command('VolumeDown')
+
+    async def mute_volume(self):
+        """Send mute command."""
+        await self.send_command('Mute')
+
+    async def select_source(self, source):
+        """Set the input source."""
+        if len(self._content_mapping) == 0:
+            self._content_mapping = await self.load_source_list()
+        if source in self._content_mapping:
+            uri = self._content_mapping[source]
+            await self.play_content(uri)
+
+    async def play_content(self, uri):
+        """Play content by URI."""
+        await self.bravia_req_json(*self._play_content_build(uri))
+
+    async def media_play(self):
+        """Send play command."""
+        await self.send_command('Play')
+
+    async def media_pause(self):
+        """Send media pause command to media player."""
+        await self.send_command('Pause')
+
+    async def media_tvpause(self):
+        """Send tv pause command to media player."""
+        await self.send_command('TvPause')
+
+    async def media_next_track(self):
+        """Send next track command."""
+        await self.send_command('Next')
+
+    async def media_previous_track(self):
+        """Send the previous track command."""
+        await self.send_command('Prev')
+
+    async def get_led_status(self):
+        """Get LED status: off, active, standby.
+           By default the TV is turned off."""
+        resp = await self.bravia_req_json(
+            "sony/system", self._jdata_build("getLEDIndicatorStatus"), False)
+        if resp is not None and not resp.get('error'):
+            return resp.get('result')[0].get('mode')
+        return 'off'
+
+    async def set_led_status(self, mode, status):
+        """Set LED mode/status, see BraviaRC.set_led_status."""
+        payload = {"mode": mode, "status": status}
+        await self.bravia_req_json(
+            "sony/system",
+            self._jdata_build("setLEDIndicatorStatus", payload,
+                              apiVersion="1.1"))
@@ -0,0 +1,140 @@
+"""
+Catalogue of the apps installed on a Sony Bravia TV.
+"""
+import difflib
+import hashlib
+import io
+import time
+
+from .models import AppInfo
+
+APP_LIST_TTL = 600
+FUZZY_CUTOFF = 0.6
+
+
+def parse_dial_app_list(content):
+    """Return the (name, id) pairs of a DIAL app list.
+
+       The document is parsed as a stream and each app element is dropped
+       once read.
+    """
+    import xml.etree.ElementTree as ElementTree
+
+    apps = []
+    name = app_id = None
+    for _, element in ElementTree.iterparse(io.BytesIO(content)):
+        tag = element.tag.rpartition('}')[2]
+        if tag == 'name':
+            name = element.text
+        elif tag == 'id':
+            app_id = element.text
+        elif tag == 'app':
+            if name and app_id:
+                apps.append((name, app_id))
+            name = app_id = None
+            element.clear()
+    return apps
+
+
+def _normalize(name):
+    return ' '.join(name.casefold().split())
+
+
+class AppCatalogue(object):
+
+    def __init__(self, ttl=APP_LIST_TTL):
+        """Apps of a TV merged from the DIAL app list and the appControl
+           getApplicationList, indexed by case-insensitive name and id.
+
+           The catalogue expires ttl seconds after its last update. The
+           ETag of the DIAL list is kept for revalidation, and a list whose
+           body did not change is not parsed again.
+        """
+        self._ttl = ttl
+        self._updated = None
+        self._dial_apps = []
+        self._dial_digest = None
+        self._control_apps = []
+        self._by_name = {}
+        self._by_id = {}
+        self.etag = None
+
+    def __iter__(self):
+        return iter(self._by_name.values())
+
+    def __len__(self):
+        return len(self._by_name)
+
+    def expired(self):
+        return self._updated is None or \
+            time.monotonic() - self._updated >= self._ttl
+
+    def invalidate(self):
+        self._updated = None
+
+    def parse_dial(self, content, etag=None):
+        """Return the (name, id) pairs of a DIAL app list body."""
+        digest = hashlib.sha1(content).digest()
+        if digest != self._dial_digest:
+            self._dial_apps = parse_dial_app_list(content)
+            self._dial_digest = digest
+        self.etag = etag
+        return self._dial_apps
+
+    def dial_apps(self):
+        return list(self._dial_apps)
+
+    def update(self, dial_apps, control_apps):
+        """Replace the apps of each list, None keeps the previous ones."""
+        if dial_apps is not None:
+            self._dial_apps = dial_apps
+        if control_apps is not None:
+            self._control_apps = control_apps
+
+        by_name = {}
+        for app in self._control_apps:
+            if app.title:
+                by_name[_normalize(app.title)] = app
+        for name, app_id in self._dial_apps:
+            app = by_name.get(_normalize(name))
+            if app is None:
+                by_name[_normalize(name)] = AppInfo(name, None, None, app_id)
+            else:
+                by_name[_normalize(name)] = AppInfo(app.title, app.uri,
+                                                    app.icon, app_id)
+        by_id = {}
+        for app in by_name.values():
+            for app_id in (app.uri, app.dial_id):
+                if app_id:
+                    by_id[app_id] = app
+        self._by_name = by_name
+        self._by_id = by_id
+        self._updated = time.monotonic()
+
+    def get(self, name):
+        """Return the AppInfo of an app by id or name ignoring case, or None.
+        """
+        app = self._by_id.get(name)
+        if app is not None:
+            return app
+        return self._by_name.get(_normalize(name))
+
+    def find(self, name):
+        """Return the AppInfo of an app by name or id, or None.
+
+           Names are matched exactly as by get, then by unique prefix, then
+           by the closest name.
+        """
+        app = self.get(name)
+        if app is not None:
+            return app
+        key = _normalize(name)
+        prefixed = [app_name for app_name in self._by_name
+                    if app_name.startswith(key)]
+        if len(prefixed) == 1:
+            return self._by_name[prefixed[0]]
+        matches = difflib.get_close_matches(key, self._by_name, n=1,
+                                            cutoff=FUZZY_CUTOFF)
+        if matches:
+            return self._by_name[matches[0]]
+        return None
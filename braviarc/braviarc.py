@@ -7,37 +7,172 @@ dedicated to Isabel
 """
 import logging
 import collections
+import contextlib
+import functools
+import ipaddress
 import json
 import socket
+import re
 import struct
-import requests
-from datetime import datetime
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import time
-import sys
-from xml.etree.ElementTree import Element, SubElement, tostring
+
+from .apps import APP_LIST_TTL, AppCatalogue
+from .cache import CommandCache, ResponseCache
+from .clock import PlaybackClock
+from .metrics import RequestEvent
+from .models import (AppInfo, ContentItem, NetworkInfo, PlayingInfo,
+                     SystemInfo, VolumeInfo, loads)
+from .policy import (CircuitBreaker, DEFAULT_DEADLINES, DEFAULT_POLICIES,
+                     DEFAULT_POLICY, is_idempotent)
+from .sessions import SessionStore
+from .singleflight import SingleFlight
+from .transport import (DEFAULT_TRANSPORT, HTTPError, POOL_CONNECTIONS,
+                        POOL_MAXSIZE, RequestsTransport, Timeout,
+                        TransportError, create_session, create_transport)
 
 TIMEOUT = 10
+COMMAND_TTL = 7 * 24 * 3600
+COMMAND_RETRY_INTERVAL = 30
+IRCC_CACHE_SIZE = 256
+CONTENT_PAGE_SIZE = 50
+SOURCE_LIST_TTL = 3600
+POWER_UNREACHABLE = 'unreachable'
+WOL_BURST = 3
+WAKE_POLL_INTERVAL = 0.5
+WAKE_POLL_TIMEOUT = 1
+# power on, unlike TvPower which toggles on most models
+WAKEUP_CODE = 'AAAAAQAAAAEAAAAuAw=='
+# seconds between getPlayingContentInfo while the playback clock is over
+CLOCK_SYNC_INTERVAL = 10
+# HTTP statuses and JSON-RPC error codes of a rejected auth cookie
+AUTH_ERRORS = (401, 403)
+
+IRCC_ENVELOPE = (
+    "<?xml version='1.0' encoding='utf8'?>\n"
+    '<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/" '
+    's:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/">'
+    '<s:Body>'
+    '<u:X_SendIRCC xmlns:u="urn:schemas-sony-com:service:IRCC:1">'
+    '<IRCCCode>{}</IRCCCode>'
+    '</u:X_SendIRCC>'
+    '</s:Body>'
+    '</s:Envelope>')
 
 _LOGGER = logging.getLogger(__name__)
 
 
-class BraviaRC(object):
+class BraviaRCError(Exception):
+    """Raised on transport errors by instances created with raise_errors."""
 
-    def __init__(self, host, psk=None, mac=None):
-        """Initialize the Sony Bravia RC class.
 
-           MAC address is optional but necessary if we want to turn on the TV.
+class DeadlineExceeded(BraviaRCError):
+    """The TV did not answer before its deadline."""
+
+
+class CircuitOpenError(BraviaRCError):
+    """The TV failed repeatedly and is not contacted for a while."""
+
+
+BraviaState = collections.namedtuple('BraviaState',
+                                     ['power', 'playing', 'volume'])
+
+KeyTiming = collections.namedtuple('KeyTiming',
+                                   ['name', 'code', 'start', 'elapsed', 'ok'])
+
+_REPEAT_RE = re.compile(r'^\s*(\S+)\s*[x*]\s*(\d+)\s*$')
+# start of the payloads built by _jdata_build
+_METHOD_PREFIX = '{"method": "'
+
+
+def _payload_method(params):
+    """Return the method of a JSON-RPC payload.
+
+       It is sliced from the payloads of _jdata_build, other payloads are
+       decoded.
+    """
+    if params.startswith(_METHOD_PREFIX):
+        end = params.find('"', len(_METHOD_PREFIX))
+        method = params[len(_METHOD_PREFIX):end]
+        if end > 0 and '\\' not in method:
+            return method
+    return json.loads(params).get('method')
+
+
+def _with_deadline(function):
+    """Run a BraviaRC method within its deadline, see BraviaRC.deadline."""
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        seconds = self._deadlines.get(function.__name__)
+        if seconds is None:
+            return function(self, *args, **kwargs)
+        with self.deadline(seconds):
+            return function(self, *args, **kwargs)
+    return wrapper
+
+
+@functools.lru_cache(maxsize=IRCC_CACHE_SIZE)
+def ircc_body_build(code):
+    """Return the encoded SOAP envelope sending an IRCC code.
+
+       Bodies are cached per code as only the code changes between calls.
+    """
+    # as xml.sax.saxutils.escape, which imports urllib and http.client
+    code = (code or '').replace('&', '&amp;').replace('<', '&lt;') \
+        .replace('>', '&gt;')
+    return IRCC_ENVELOPE.format(code).encode('utf-8')
 
-           If PSK is not passed then standard basic auth is used.
-        """
 
+TV_SOURCES = ('tv:dvbc', 'tv:dvbt', 'tv:isdbt', 'tv:isdbbs', 'tv:isdbcs',
+              'tv:isdbgt')
+EXT_INPUT_SOURCES = ('extInput:hdmi', 'extInput:composite',
+                     'extInput:component')
+
+
+class BraviaRCBase(object):
+    """Payload building and response parsing shared by the sync and
+       asyncio clients. It never talks to the network."""
+
+    def __init__(self, host, psk=None, mac=None, command_cache=None,
+                 command_ttl=COMMAND_TTL, session_store=None):
         self._host = host
         self._mac = mac
+        self._broadcast = None
         self._psk = psk
         self._cookies = None
-        self._commands = []
+        self._headers = {}
+        if psk is not None:
+            self._headers['X-Auth-PSK'] = psk
+        self._ircc_headers = dict(self._headers)
+        self._ircc_headers['SOAPACTION'] = \
+            '"urn:schemas-sony-com:service:IRCC:1#X_SendIRCC"'
+        self._commands = {}
+        self._commands_time = None
+        self._commands_failure_time = None
+        self._command_ttl = command_ttl
+        if isinstance(command_cache, str):
+            command_cache = CommandCache(command_cache)
+        self._command_cache = command_cache
+        if command_cache is not None:
+            cached = command_cache.load(host)
+            if cached is not None:
+                self._commands_time, self._commands = cached
         self._content_mapping = []
-        self._app_list = {}
+        self._last_power_status = None
+        self._clock = None
+        self._clock_synced = None
+        self._clientid = None
+        self._nickname = None
+        if isinstance(session_store, str):
+            session_store = SessionStore(session_store)
+        self._session_store = session_store
+        if session_store is not None:
+            saved = session_store.load(host)
+            if saved is not None:
+                self._cookies = saved.get('cookies') or None
+                self._clientid = saved.get('clientid')
+                self._nickname = saved.get('nickname')
 
     def _jdata_build(self, method, params=None, apiVersion="1.0"):
         if params:
@@ -52,24 +187,11 @@ class BraviaRC(object):
                               "version": apiVersion})
         return ret
 
-    def connect(self, pin, clientid, nickname):
-        """Connect to TV and get authentication cookie.
+    def _decode_json(self, content):
+        return loads(content)
 
-        Parameters
-        ---------
-        pin: str
-            Pin code show by TV (or 0000 to get Pin Code).
-        clientid: str
-            Client ID.
-        nickname: str
-            Client human friendly name.
-
-        Returns
-        -------
-        bool
-            True if connected.
-        """
-        authorization = json.dumps(
+    def _auth_jdata_build(self, clientid, nickname):
+        return json.dumps(
             {"method": "actRegister",
              "params": [{"clientid": clientid,
                          "nickname": nickname,
@@ -80,40 +202,181 @@ class BraviaRC(object):
              "version": "1.0"}
         ).encode('utf-8')
 
-        headers = {'Connection': 'keep-alive'}
+    def _play_content_build(self, uri):
+        """Return the (url, payload) pair to play content by URI."""
+        if uri.startswith("com.sony.dtv"):
+            return ("sony/appControl",
+                    self._jdata_build("setActiveApp", {"uri": uri}))
+        return ("sony/avContent",
+                self._jdata_build("setPlayContent", {"uri": uri}))
 
-        auth = None
+    def _volume_jdata_build(self, volume):
+        api_volume = str(int(round(volume * 100)))
+        payload = {"target": "speaker", "volume": api_volume}
+        return self._jdata_build("setAudioVolume", payload)
 
-        if pin:
-            auth = ('', pin)
+    def _mute_jdata_build(self, mute):
+        return self._jdata_build("setAudioMute", {"status": bool(mute)})
 
-        url = 'http://%s/sony/accessControl' % self._host
+    def _parse_content_list(self, resp):
+        """Return the ContentItems of a getContentList response."""
+        if resp is not None and not resp.get('error'):
+            return [ContentItem.from_json(content_item)
+                    for content_item in resp.get('result')[0]]
+        return None
 
-        try:
-            response = requests.post(url, data=authorization, headers=headers,
-                                     timeout=TIMEOUT, auth=auth)
-            response.raise_for_status()
+    def _parse_application_list(self, resp):
+        """Return the AppInfos of a getApplicationList response."""
+        if resp is not None and not resp.get('error'):
+            return [AppInfo.from_json(app) for app in resp.get('result')[0]]
+        return None
 
-        except requests.exceptions.HTTPError as exception_instance:
-            _LOGGER.error("[W] HTTPError: " + str(exception_instance))
-            return False
+    def _parse_source_list(self, resp, sources):
+        """Return the entries of a getSourceList response in sources."""
+        if resp is not None and not resp.get('error'):
+            return [result for result in resp.get('result')[0]
+                    if result['source'] in sources]
+        return []
 
-        except requests.exceptions.Timeout as exception_instance:
-            _LOGGER.error("[W] Timeout occurred: " + str(exception_instance))
-            return False
+    def _parse_content_count(self, resp):
+        if resp is not None and not resp.get('error'):
+            return resp.get('result')[0].get('count')
+        return None
 
-        except Exception as exception_instance:  # pylint: disable=broad-except
-            _LOGGER.error("[W] Exception: " + str(exception_instance))
+    def _build_content_mapping(self, content_list):
+        return_value = collections.OrderedDict()
+        for content_item in content_list:
+            return_value[content_item.title] = content_item.uri
+        return return_value
+
+    def _parse_playing_info(self, resp):
+        if resp is not None and not resp.get('error'):
+            playing_info = PlayingInfo(resp.get('result')[0])
+        else:
+            playing_info = PlayingInfo()
+        if resp is not None:
+            self.update_playback_clock(playing_info)
+        return playing_info
+
+    def update_playback_clock(self, playing_info):
+        """Re-seed the playback clock from a PlayingInfo, e.g. of a
+           content notification, when the programme changed."""
+        if self._clock is None or not self._clock.matches(playing_info):
+            self._clock = PlaybackClock.from_playing_info(playing_info)
+        self._clock_synced = time.monotonic()
+        return self._clock
+
+    def _clock_stale(self):
+        """Whether the TV should be asked for the programme playing."""
+        if self._clock is not None and not self._clock.ended():
             return False
+        return self._clock_synced is None or \
+            time.monotonic() - self._clock_synced >= CLOCK_SYNC_INTERVAL
+
+    def _parse_system_info(self, resp):
+        if resp is not None and not resp.get('error'):
+            return SystemInfo(resp.get('result')[0])
+        return SystemInfo()
+
+    def _parse_network_info(self, resp):
+        if resp is not None and not resp.get('error'):
+            return NetworkInfo(resp.get('result')[0][0])
+        return NetworkInfo()
+
+    def _remember_network_info(self, network_info):
+        """Keep the MAC and subnet broadcast address for Wake-on-LAN."""
+        if not network_info:
+            return
+        if self._mac is None:
+            self._mac = network_info['mac']
+        if network_info.get('netmask'):
+            try:
+                self._broadcast = str(ipaddress.IPv4Network(
+                    '{}/{}'.format(network_info['ip'],
+                                   network_info['netmask']),
+                    strict=False).broadcast_address)
+            except ValueError:
+                pass
+
+    def _parse_power_status(self, resp):
+        if resp is not None and not resp.get('error'):
+            power_data = resp.get('result')[0]
+            return power_data.get('status')
+        return 'off'
 
+    def _parse_volume_info(self, resp):
+        if resp is not None and not resp.get('error'):
+            results = resp.get('result')[0]
+            for result in results:
+                if result.get('target') == 'speaker':
+                    return VolumeInfo(result)
         else:
-            resp = response.json()
-            _LOGGER.debug(json.dumps(resp, indent=4))
-            if resp is None or not resp.get('error'):
-                self._cookies = response.cookies
-                return True
+            _LOGGER.error("JSON request error:" + json.dumps(resp, indent=4))
+        return None
 
-        return False
+    def _parse_commands(self, resp):
+        if resp is not None and not resp.get('error'):
+            return dict((command_data.get('name'), command_data.get('value'))
+                        for command_data in resp.get('result')[1])
+        _LOGGER.error("JSON request error: " + json.dumps(resp, indent=4))
+        return None
+
+    def _commands_expired(self):
+        """Whether the command table has to be fetched again.
+
+           An empty table is only fetched again COMMAND_RETRY_INTERVAL
+           seconds after a failure, e.g. while the TV is off.
+        """
+        if not self._commands:
+            return self._commands_failure_time is None or \
+                time.monotonic() - self._commands_failure_time > \
+                COMMAND_RETRY_INTERVAL
+        return time.time() - self._commands_time > self._command_ttl
+
+    def _update_commands(self, commands, system_info=None):
+        """Store a freshly fetched command table, None means failure."""
+        if commands is None:
+            self._commands_failure_time = time.monotonic()
+            return
+        # set first, readers test the table then its age
+        self._commands_time = time.time()
+        self._commands = commands
+        self._commands_failure_time = None
+        if self._command_cache is not None and system_info:
+            model = '{}/{}'.format(system_info.get('model'),
+                                   system_info.get('generation'))
+            self._command_cache.store(self._host, model, commands,
+                                      self._commands_time)
+
+    def _expand_sequence(self, keys):
+        """Return the (name, code) pairs of a key sequence.
+
+           Keys are command names, optionally repeated as 'VolumeUp x10' or
+           ('VolumeUp', 10). Raises ValueError on unknown commands before
+           anything is sent.
+        """
+        sequence = []
+        for key in keys:
+            count = 1
+            if isinstance(key, (tuple, list)):
+                key, count = key
+            else:
+                match = _REPEAT_RE.match(key)
+                if match:
+                    key, count = match.group(1), int(match.group(2))
+            code = self._commands.get(key)
+            if code is None:
+                raise ValueError("Unknown command: {}".format(key))
+            sequence.extend([(key, code)] * count)
+        return sequence
+
+    def invalidate_commands(self):
+        """Forget the command table so that it is fetched on next use."""
+        # an empty table is expired whatever its time
+        self._commands = {}
+        self._commands_failure_time = None
+        if self._command_cache is not None:
+            self._command_cache.forget(self._host)
 
     def is_connected(self):
         if self._cookies is None:
@@ -121,7 +384,27 @@ class BraviaRC(object):
         else:
             return True
 
-    def _wakeonlan(self):
+    def _remember_session(self, cookies, clientid, nickname):
+        """Keep the cookies of a registration, in the session store too."""
+        self._cookies = cookies
+        self._clientid = clientid
+        self._nickname = nickname
+        if self._session_store is not None:
+            self._session_store.store(self._host, cookies, clientid, nickname)
+
+    def _can_reauthenticate(self):
+        """Whether an expired cookie can be renewed by registering again."""
+        return self._psk is None and self._clientid is not None
+
+    def _auth_cookie(self):
+        """The auth cookie sent to the DIAL root path, None without one."""
+        if not self._cookies or self._cookies.get("auth") is None:
+            return None
+        return {"auth": self._cookies["auth"]}
+
+    def _wakeonlan(self, count=1):
+        """Send count magic packets to the local and the subnet broadcast
+           address of the TV, when known."""
         if self._mac is not None:
             addr_byte = self._mac.split(':')
             hw_addr = struct.pack('BBBBBB', int(addr_byte[0], 16),
@@ -131,87 +414,572 @@ class BraviaRC(object):
                                   int(addr_byte[4], 16),
                                   int(addr_byte[5], 16))
             msg = b'\xff' * 6 + hw_addr * 16
+            addresses = ['<broadcast>']
+            if self._broadcast is not None:
+                addresses.append(self._broadcast)
             socket_instance = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             socket_instance.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST,
                                        1)
-            socket_instance.sendto(msg, ('<broadcast>', 9))
-            socket_instance.close()
+            try:
+                for _ in range(count):
+                    for address in addresses:
+                        socket_instance.sendto(msg, (address, 9))
+            finally:
+                socket_instance.close()
 
-    def send_req_ircc(self, params, log_errors=True):
-        """Send an IRCC command via HTTP to Sony Bravia."""
-        headers = {'SOAPACTION':
-                   '"urn:schemas-sony-com:service:IRCC:1#X_SendIRCC"'}
+    def calc_time(self, *times):
+        """Calculate the sum of times, value is returned in HH:MM."""
+        total_secs = 0
+        for tms in times:
+            time_parts = [int(s) for s in tms.split(':')]
+            total_secs += (time_parts[0] * 60 + time_parts[1]) * 60 + \
+                time_parts[2]
+        total_secs, sec = divmod(total_secs, 60)
+        hour, minute = divmod(total_secs, 60)
+        if hour >= 24:  # set 24:10 to 00:10
+            hour -= 24
+        return ("%02d:%02d" % (hour, minute))
+
+    def playing_time(self, startdatetime, durationsec):
+        """Give starttime, endtime and percentage played.
+
+        Start time format: 2017-03-24T00:00:00+0100
+        See PlaybackClock, which avoids parsing it again on every call.
+        """
+        return PlaybackClock(startdatetime, durationsec).as_dict()
+
+
+class BraviaRC(BraviaRCBase):
+
+    def __init__(self, host, psk=None, mac=None, session=None,
+                 pool_maxsize=POOL_MAXSIZE, timeouts=None, raise_errors=False,
+                 command_cache=None, command_ttl=COMMAND_TTL,
+                 source_list_ttl=SOURCE_LIST_TTL, hooks=None,
+                 policies=None, deadlines=None, circuit_breaker=None,
+                 app_list_ttl=APP_LIST_TTL, session_store=None,
+                 response_cache=None, transport=None):
+        """Initialize the Sony Bravia RC class.
+
+           MAC address is optional but necessary if we want to turn on the TV.
+
+           If PSK is not passed then standard basic auth is used.
+
+           transport sends the HTTP requests: 'requests' (the default) or
+           'http.client', which only needs the standard library, for a
+           private pool of pool_maxsize connections released by close(),
+           or a transport.RequestsTransport or HTTPClientTransport shared
+           by several instances. A shared requests session (see
+           create_session) can also be passed as session. requests is only
+           imported when a requests transport is used.
+
+           policies maps JSON-RPC methods, request labels ('X_SendIRCC',
+           'getAppList', 'startApp') or endpoints to a policy.RequestPolicy
+           giving the connect and read timeouts and the retries of the
+           call, over policy.DEFAULT_POLICIES. Only idempotent getters are
+           retried, on connection errors and HTTP 5xx. timeouts maps
+           endpoints (e.g. 'sony/system', 'sony/IRCC') to a read timeout
+           in seconds overriding the policies.
+
+           deadlines maps method names (e.g. 'turn_on', 'load_source_list')
+           to the time in seconds all the requests of one call may take,
+           over policy.DEFAULT_DEADLINES; see deadline().
+
+           circuit_breaker is a policy.CircuitBreaker refusing requests
+           with CircuitOpenError while the TV is known to be down, one is
+           created by default; pass False to disable it.
+
+           By default transport errors are logged and the call returns None,
+           with raise_errors they are raised as BraviaRCError instead.
+
+           command_cache is a CommandCache, or the path of one, where the
+           remote controller commands are persisted per model/firmware and
+           loaded from at construction. They are fetched again after
+           command_ttl seconds or invalidate_commands().
+
+           session_store is a sessions.SessionStore, or the path of one,
+           where the auth cookie obtained by connect() is saved per host
+           and loaded from at construction, so that restarting does not
+           register again. When the TV rejects the cookie (HTTP 401/403 or
+           a JSON-RPC 401/403 error), the client registers again once with
+           the clientid and nickname of connect() and replays the request;
+           a TV still rejecting it needs a new connect() with a PIN.
+
+           The source list is cached for source_list_ttl seconds and the
+           app catalogue for app_list_ttl seconds.
+
+           response_cache is a cache.ResponseCache keeping the responses of
+           getters per cache.RESPONSE_TTLS: static ones such as
+           getSystemInformation for an hour, power, volume and playing
+           content for a second. Mutating calls drop the responses they
+           make stale, e.g. setAudioVolume those of getVolumeInformation.
+           One is created by default; pass False to disable it.
+
+           hooks are callables receiving a metrics.RequestEvent after every
+           HTTP request, see add_hook.
+
+           An instance can be shared by threads. Concurrent calls needing
+           the command table, the source list or the app catalogue, and
+           concurrent identical getter requests, share one request to the
+           TV and its result.
+        """
+
+        super(BraviaRC, self).__init__(host, psk, mac, command_cache,
+                                       command_ttl, session_store)
+        self._owns_transport = transport is None or \
+            isinstance(transport, str)
+        if session is not None and transport in (None, 'requests'):
+            transport = RequestsTransport(session)
+        elif self._owns_transport:
+            transport = create_transport(transport or DEFAULT_TRANSPORT, 1,
+                                         pool_maxsize)
+        self._transport = transport
+        self._timeouts = dict(timeouts or {})
+        self._raise_errors = raise_errors
+        self._pool_maxsize = pool_maxsize
+        self._executor = None
+        self._source_list_ttl = source_list_ttl
+        self._source_list_time = None
+        self._source_cache = {}
+        self._hooks = list(hooks or [])
+        self._policies = dict(DEFAULT_POLICIES)
+        self._policies.update(policies or {})
+        self._deadlines = dict(DEFAULT_DEADLINES)
+        self._deadlines.update(deadlines or {})
+        if circuit_breaker is None:
+            circuit_breaker = CircuitBreaker()
+        self._breaker = circuit_breaker or None
+        self._local = threading.local()
+        self._apps = AppCatalogue(app_list_ttl)
+        if response_cache is None:
+            response_cache = ResponseCache()
+        # an empty cache is falsy
+        self._responses = response_cache if response_cache is not False \
+            else None
+        self._flight = SingleFlight()
+        self._executor_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Release the connection pool if it is owned by this instance."""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+        if self._owns_transport:
+            self._transport.close()
+
+    def _get_executor(self):
+        """Worker threads used to issue independent requests concurrently."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._pool_maxsize)
+            return self._executor
+
+    def _submit(self, function, *args):
+        """Run function on a worker thread within the current deadline."""
+        deadline = getattr(self._local, 'deadline', None)
+
+        def run():
+            previous = getattr(self._local, 'deadline', None)
+            self._local.deadline = deadline
+            try:
+                return function(*args)
+            finally:
+                self._local.deadline = previous
+
+        return self._get_executor().submit(run)
+
+    @contextlib.contextmanager
+    def deadline(self, seconds):
+        """Bound the requests sent by this thread within the block.
+
+           Timeouts are clamped to the remaining time and requests made
+           after it raise DeadlineExceeded, like transport errors. Nested
+           deadlines cannot extend the enclosing one.
+        """
+        previous = getattr(self._local, 'deadline', None)
+        end = time.monotonic() + seconds
+        if previous is not None:
+            end = min(end, previous)
+        self._local.deadline = end
+        try:
+            yield
+        finally:
+            self._local.deadline = previous
+
+    def _on_error(self, message, exception_instance, log_errors=True):
+        """Log a transport error or raise it if raise_errors is set."""
+        if self._raise_errors:
+            if isinstance(exception_instance, BraviaRCError):
+                raise exception_instance
+            raise BraviaRCError(message + str(exception_instance)) \
+                from exception_instance
+        if log_errors:
+            _LOGGER.error(message + str(exception_instance))
+
+    def add_hook(self, hook):
+        """Call hook(event) with a metrics.RequestEvent after each request.
+
+           Hooks run in the thread that sent the request and should be fast,
+           e.g. a metrics.MetricsRegistry.
+        """
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    def _policy(self, endpoint, label):
+        policy = self._policies.get(label) or \
+            self._policies.get(endpoint) or DEFAULT_POLICY
+        connect_timeout = policy.connect_timeout
+        read_timeout = self._timeouts.get(endpoint, policy.read_timeout)
+        retries = policy.retries if is_idempotent(label) else 0
+        return connect_timeout, read_timeout, retries, policy.backoff
+
+    def _remaining(self, label):
+        """Seconds left before the current deadline, None without one."""
+        deadline = getattr(self._local, 'deadline', None)
+        if deadline is None:
+            return None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded('{}: deadline exceeded before {}'.format(
+                self._host, label))
+        return remaining
+
+    def invalidate_responses(self, methods=None):
+        """Drop the cached responses of the JSON-RPC methods, or all."""
+        if self._responses is not None:
+            self._responses.invalidate(methods)
+
+    def _request(self, method, path, endpoint=None, label=None, **kwargs):
+        """Send an HTTP request to the TV through the pooled session.
+
+           endpoint defaults to path. label names the call (e.g. the
+           JSON-RPC method) for the policies and the hooks. Idempotent
+           calls are retried with exponential backoff on connection errors
+           and HTTP 5xx, the last 5xx response is returned. A request
+           whose auth cookie is rejected is replayed once after
+           registering again.
+        """
+        stale = ()
+        if self._responses is not None:
+            stale = self._responses.stale_methods(label)
+        if not stale:
+            return self._send_request(method, path, endpoint, label, kwargs)
+        # before, and after for the getters sent meanwhile
+        self._responses.invalidate(stale)
+        try:
+            return self._send_request(method, path, endpoint, label, kwargs)
+        finally:
+            self._responses.invalidate(stale)
+
+    def _send_request(self, method, path, endpoint, label, kwargs):
+        if endpoint is None:
+            endpoint = path
+        connect_timeout, read_timeout, retries, backoff = \
+            self._policy(endpoint, label)
+        url = 'http://{}/{}'.format(self._host, path)
+        attempt = 0
+        reauthenticated = False
+        while True:
+            # before allow(), which may hand out the trial request
+            remaining = self._remaining(label)
+            if remaining is None:
+                kwargs['timeout'] = (connect_timeout, read_timeout)
+            else:
+                kwargs['timeout'] = (min(connect_timeout, remaining),
+                                     min(read_timeout, remaining))
+            if self._breaker is not None and not self._breaker.allow():
+                raise CircuitOpenError('{}: circuit open, not sending '
+                                       '{}'.format(self._host, label))
+            try:
+                response = self._send(method, url, endpoint, label, attempt,
+                                      kwargs)
+            except TransportError:
+                if self._breaker is not None:
+                    self._breaker.record_failure()
+                if attempt >= retries:
+                    raise
+            except BaseException:
+                # neither an answer nor a transport failure
+                if self._breaker is not None:
+                    self._breaker.release()
+                raise
+            else:
+                # the TV answered, even with an error
+                if self._breaker is not None:
+                    self._breaker.record_success()
+                if not reauthenticated and \
+                   self._auth_rejected(endpoint, label, response):
+                    reauthenticated = True
+                    if self._reauthenticate(kwargs.get('cookies')):
+                        kwargs['cookies'] = self._cookies
+                        continue
+                    return response
+                if response.status_code < 500 or attempt >= retries:
+                    return response
+            delay = backoff * 2 ** attempt
+            remaining = self._remaining(label)
+            if remaining is not None and remaining <= delay:
+                raise DeadlineExceeded('{}: no time left to retry {}'.format(
+                    self._host, label))
+            time.sleep(delay)
+            attempt += 1
+
+    def _auth_rejected(self, endpoint, label, response):
+        """Whether the TV rejected a renewable auth cookie."""
+        if label == 'actRegister' or not self._can_reauthenticate():
+            return False
+        if response.status_code in AUTH_ERRORS:
+            return True
+        if response.status_code != 200 or endpoint == 'sony/IRCC' or \
+           not endpoint.startswith('sony/') or \
+           b'"error"' not in response.content:
+            return False
+        try:
+            error = self._decode_json(response.content).get('error')
+        except (ValueError, AttributeError):
+            return False
+        return bool(error) and error[0] in AUTH_ERRORS
+
+    def _reauthenticate(self, cookies):
+        """Register again after cookies were rejected, True on success.
+
+           Threads whose cookie is rejected at the same time share one
+           registration.
+        """
+        return self._flight.do('auth', self._register_again, cookies)
+
+    def _register_again(self, cookies):
+        if self._cookies and self._cookies.get('auth') != \
+           (cookies or {}).get('auth'):
+            # renewed by another thread since the request was sent
+            return True
+        _LOGGER.info("%s: auth cookie rejected, registering again",
+                     self._host)
+        try:
+            return self.connect(None, self._clientid, self._nickname)
+        except BraviaRCError:
+            return False
+
+    def _send(self, method, url, endpoint, label, attempt, kwargs):
+        if not self._hooks:
+            return self._transport.request(method, url, **kwargs)
+
+        start = time.monotonic()
+        response = None
+        error = None
+        try:
+            response = self._transport.request(method, url, **kwargs)
+        except Exception as exception_instance:
+            error = type(exception_instance).__name__
+            raise
+        finally:
+            self._emit_event(endpoint, label, start, kwargs.get('data'),
+                             response, error, attempt)
+        return response
+
+    def _emit_event(self, endpoint, label, start, data, response, error,
+                    retries):
+        elapsed = time.monotonic() - start
+        status = response_time = None
+        response_bytes = 0
+        if response is not None:
+            status = response.status_code
+            response_time = response.elapsed
+            response_bytes = len(response.content)
+            if status >= 400:
+                error = 'HTTPError'
+            elif endpoint.startswith('sony/') and endpoint != 'sony/IRCC':
+                try:
+                    rpc_error = self._decode_json(response.content).get(
+                        'error')
+                except (ValueError, AttributeError):
+                    rpc_error = None
+                if rpc_error:
+                    error = 'JSONRPC{}'.format(rpc_error[0])
+        event = RequestEvent(self._host, endpoint, label, status, elapsed,
+                             response_time, len(data) if data else 0,
+                             response_bytes, error, retries)
+        for hook in list(self._hooks):
+            try:
+                hook(event)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Error in request hook")
+
+    def connect(self, pin, clientid, nickname):
+        """Connect to TV and get authentication cookie.
+
+        Parameters
+        ---------
+        pin: str
+            Pin code show by TV (or 0000 to get Pin Code).
+        clientid: str
+            Client ID.
+        nickname: str
+            Client human friendly name.
 
-        if self._psk is not None:
-            headers['X-Auth-PSK'] = self._psk
+        Returns
+        -------
+        bool
+            True if connected.
+        """
+        authorization = self._auth_jdata_build(clientid, nickname)
+
+        auth = None
+
+        if pin:
+            auth = ('', pin)
+
+        try:
+            response = self._request('POST', 'sony/accessControl',
+                                     label='actRegister',
+                                     data=authorization, auth=auth)
+            response.raise_for_status()
+
+        except HTTPError as exception_instance:
+            self._on_error("[W] HTTPError: ", exception_instance)
+            return False
+
+        except Timeout as exception_instance:
+            self._on_error("[W] Timeout occurred: ", exception_instance)
+            return False
+
+        except Exception as exception_instance:  # pylint: disable=broad-except
+            self._on_error("[W] Exception: ", exception_instance)
+            return False
+
+        else:
+            resp = response.json()
+            _LOGGER.debug(json.dumps(resp, indent=4))
+            if resp is None or not resp.get('error'):
+                self._remember_session(dict(response.cookies), clientid,
+                                       nickname)
+                return True
 
-        root = Element('s:Envelope',
-                       {"xmlns:s": "http://schemas.xmlsoap.org/soap/envelope/",
-                        "s:encodingStyle":
-                            "http://schemas.xmlsoap.org/soap/encoding/"})
-        body = SubElement(root, "s:Body")
-        sendIRCC = SubElement(body, "u:X_SendIRCC",
-                              {"xmlns:u":
-                               "urn:schemas-sony-com:service:IRCC:1"})
-        irccCode = SubElement(sendIRCC, "IRCCCode")
-        irccCode.text = params
+        return False
 
-        xml_str = tostring(root, encoding='utf8')
+    def send_req_ircc(self, params, log_errors=True):
+        """Send an IRCC command via HTTP to Sony Bravia."""
+        xml_str = ircc_body_build(params)
 
         try:
-            response = requests.post('http://' + self._host + '/sony/IRCC',
-                                     headers=headers,
+            response = self._request('POST', 'sony/IRCC', label='X_SendIRCC',
+                                     headers=self._ircc_headers,
                                      cookies=self._cookies,
-                                     data=xml_str,
-                                     timeout=TIMEOUT)
-        except requests.exceptions.HTTPError as exception_instance:
-            if log_errors:
-                _LOGGER.error("HTTPError: " + str(exception_instance))
+                                     data=xml_str)
+            # e.g. an unknown code
+            response.raise_for_status()
+        except HTTPError as exception_instance:
+            self._on_error("HTTPError: ", exception_instance, log_errors)
 
-        except requests.exceptions.Timeout as exception_instance:
-            if log_errors:
-                _LOGGER.error("Timeout occurred: " + str(exception_instance))
+        except Timeout as exception_instance:
+            self._on_error("Timeout occurred: ", exception_instance, log_errors)
 
         except Exception as exception_instance:  # pylint: disable=broad-except
-            if log_errors:
-                _LOGGER.error("Exception: " + str(exception_instance))
+            self._on_error("Exception: ", exception_instance, log_errors)
         else:
             content = response.content
             return content
 
     def bravia_req_json(self, url, params, log_errors=True):
-        """ Send request command via HTTP json to Sony Bravia."""
-
-        headers = {}
-
-        if self._psk is not None:
-            headers['X-Auth-PSK'] = self._psk
-
-        built_url = 'http://{}/{}'.format(self._host, url)
+        """ Send request command via HTTP json to Sony Bravia.
 
+            Identical getter requests made concurrently share one request
+            and responses are served from the response cache while fresh.
+        """
+        label = _payload_method(params)
+        if self._responses is not None and self._responses.ttl(label):
+            resp = self._responses.get((url, params), label)
+            if resp is not None:
+                return resp
+        if is_idempotent(label):
+            return self._flight.do(('json', url, params), self._req_json,
+                                   url, params, label, log_errors)
+        return self._req_json(url, params, label, log_errors)
+
+    def _req_json(self, url, params, label, log_errors):
+        generation = None
+        if self._responses is not None and self._responses.ttl(label):
+            generation = self._responses.generation(label)
         try:
-            response = requests.post(built_url,
+            response = self._request('POST', url, label=label,
                                      data=params.encode("UTF-8"),
                                      cookies=self._cookies,
-                                     timeout=TIMEOUT,
-                                     headers=headers)
+                                     headers=self._headers)
+            # e.g. the text body of an HTTP 500
+            resp = self._decode_json(response.content)
+            if generation is not None and response.status_code == 200 and \
+               isinstance(resp, dict) and 'result' in resp:
+                self._responses.put((url, params), label, resp, generation)
+            return resp
 
-        except requests.exceptions.HTTPError as exception_instance:
-            if log_errors:
-                _LOGGER.error("HTTPError: " + str(exception_instance))
+        except HTTPError as exception_instance:
+            self._on_error("HTTPError: ", exception_instance, log_errors)
 
         except Exception as exception_instance:  # pylint: disable=broad-except
-            if log_errors:
-                _LOGGER.error("Exception: " + str(exception_instance))
-
-        else:
-            html = json.loads(response.content.decode('utf-8'))
-            return html
+            self._on_error("Exception: ", exception_instance, log_errors)
 
     def send_command(self, command):
         """Sends a command to the TV."""
         self.send_req_ircc(self.get_command_code(command))
 
+    def _send_key(self, name, code):
+        start = time.monotonic()
+        ok = self.send_req_ircc(code) is not None
+        return KeyTiming(name, code, start, time.monotonic() - start, ok)
+
+    def send_sequence(self, keys, interval_ms=100, pipeline=False,
+                      max_in_flight=4):
+        """Send a sequence of remote controller commands.
+
+           keys is a list such as ['Home', 'Down x2', 'Confirm'], see
+           _expand_sequence. All codes are resolved before the first key is
+           sent and a key is sent at most every interval_ms milliseconds.
+           By default each key waits for the previous response over the
+           same kept-alive connection; with pipeline the keys are sent on
+           schedule without waiting, up to max_in_flight at once, which may
+           reorder them on the TV.
+
+           Returns a KeyTiming per key sent.
+        """
+        if self._commands_expired():
+            self._refresh_commands()
+        sequence = self._expand_sequence(keys)
+        interval = interval_ms / 1000.0
+        next_time = time.monotonic()
+
+        if not pipeline:
+            timings = []
+            for name, code in sequence:
+                time.sleep(max(0, next_time - time.monotonic()))
+                next_time = time.monotonic() + interval
+                timings.append(self._send_key(name, code))
+            return timings
+
+        in_flight = threading.BoundedSemaphore(max_in_flight)
+
+        def send(name, code):
+            try:
+                return self._send_key(name, code)
+            finally:
+                in_flight.release()
+
+        futures = []
+        for name, code in sequence:
+            time.sleep(max(0, next_time - time.monotonic()))
+            in_flight.acquire()
+            next_time = time.monotonic() + interval
+            futures.append(self._submit(send, name, code))
+        return [future.result() for future in futures]
+
     def get_source(self, source):
         """Returns list of Sources"""
         original_content_list = []
@@ -221,98 +989,189 @@ class BraviaRC(object):
             resp = self.bravia_req_json("sony/avContent",
                                         self._jdata_build("getContentList",
                                                           payload))
-            if not resp.get('error'):
-                if len(resp.get('result')[0]) == 0:
-                    break
-                else:
-                    content_index = resp.get('result')[0][-1]['index'] + 1
-                original_content_list.extend(resp.get('result')[0])
-            else:
+            content_list = self._parse_content_list(resp)
+            if not content_list:
                 break
+            content_index = content_list[-1].index + 1
+            original_content_list.extend(content_list)
         return original_content_list
 
-    def load_source_list(self):
-        """ Load source list from Sony Bravia."""
-        original_content_list = []
+    def _get_content_page(self, source, start):
+        """Return the ContentItems of a page, None if it failed."""
+        payload = {"source": source, "stIdx": start, "cnt": CONTENT_PAGE_SIZE}
         resp = self.bravia_req_json("sony/avContent",
-                                    self._jdata_build("getSourceList",
-                                                      {"scheme": "tv"}))
-        if not resp.get('error'):
-            results = resp.get('result')[0]
-            for result in results:
-                # tv:dvbc = via cable
-                # tv:dvbt = via DTT
-                # tv:dvbs = via satellite
-                if result['source'] in ['tv:dvbc', 'tv:dvbt', 'tv:isdbt', 'tv:isdbbs', 'tv:isdbcs', 'tv:isdbgt']:
-                    source = self.get_source(result['source'])
-                    original_content_list.extend(source)
+                                    self._jdata_build("getContentList",
+                                                      payload))
+        return self._parse_content_list(resp)
 
+    def _get_content_count(self, source):
         resp = self.bravia_req_json("sony/avContent",
-                                    self._jdata_build("getSourceList",
-                                                      {"scheme": "extInput"}))
-        if not resp.get('error'):
-            results = resp.get('result')[0]
-            for result in results:
-                # physical inputs
-                if result['source'] in ('extInput:hdmi', 'extInput:composite',
-                                        'extInput:component'):
-                    data = self._jdata_build("getContentList", result)
-                    resp = self.bravia_req_json("sony/avContent", data)
-                    if not resp.get('error'):
-                        original_content_list.extend(resp.get('result')[0])
-        
-        resp = self.bravia_req_json("sony/appControl",
-                                    self._jdata_build("getApplicationList", None))
-        if not resp.get('error'):
-            results = resp.get('result')[0]
-            original_content_list+=results
+                                    self._jdata_build("getContentCount",
+                                                      {"source": source}))
+        return self._parse_content_count(resp)
+
+    def _iter_source_pages(self):
+        """Yield (key, content items) as the requests complete.
+
+           Source lists, content counts and content pages are all requested
+           concurrently. A TV source whose count did not change since the
+           previous call is served from the cache, where it is only stored
+           once all of its pages were received. Sorting by key gives the
+           order of the sequential listing: TV sources, inputs, then apps.
+        """
+        pending = {}
 
-        return_value = collections.OrderedDict()
-        for content_item in original_content_list:
-            return_value[content_item['title']] = content_item['uri']
-        return return_value
+        def submit(key, function, *args):
+            pending[self._submit(function, *args)] = key
+
+        submit(('tv',), self.bravia_req_json, "sony/avContent",
+               self._jdata_build("getSourceList", {"scheme": "tv"}))
+        submit(('ext',), self.bravia_req_json, "sony/avContent",
+               self._jdata_build("getSourceList", {"scheme": "extInput"}))
+        submit((2, 0, 0), self.bravia_req_json, "sony/appControl",
+               self._jdata_build("getApplicationList", None))
+
+        counts = {}
+        pages = {}
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = pending.pop(future)
+                    result = future.result()
+                    if key == ('tv',):
+                        # tv:dvbc = via cable
+                        # tv:dvbt = via DTT
+                        # tv:dvbs = via satellite
+                        for index, source in enumerate(
+                                self._parse_source_list(result, TV_SOURCES)):
+                            submit(('count', index, source['source']),
+                                   self._get_content_count, source['source'])
+                    elif key == ('ext',):
+                        # physical inputs
+                        for index, source in enumerate(
+                                self._parse_source_list(result,
+                                                        EXT_INPUT_SOURCES)):
+                            submit((1, index, 0), self.bravia_req_json,
+                                   "sony/avContent",
+                                   self._jdata_build("getContentList", source))
+                    elif key[0] == 'count':
+                        _, index, source = key
+                        cached = self._source_cache.get(source)
+                        if result is None:
+                            # getContentCount unsupported, page sequentially
+                            submit(('all', index, source), self.get_source,
+                                   source)
+                        elif cached is not None and cached[0] == result:
+                            yield (0, index, 0), cached[1]
+                        else:
+                            counts[source] = result
+                            pages[source] = {}
+                            for start in range(0, result, CONTENT_PAGE_SIZE):
+                                submit(('page', index, source, start),
+                                       self._get_content_page, source, start)
+                            if not result:
+                                self._source_cache[source] = (0, [])
+                    elif key[0] == 'page':
+                        _, index, source, start = key
+                        pages[source][start] = result
+                        if len(pages[source]) * CONTENT_PAGE_SIZE >= \
+                           counts[source]:
+                            self._cache_source(source, counts[source],
+                                               pages[source])
+                        yield (0, index, start), result or []
+                    elif key[0] == 'all':
+                        yield (0, key[1], 0), result
+                    elif key == (2, 0, 0):
+                        yield key, self._parse_application_list(result) or []
+                    else:
+                        yield key, self._parse_content_list(result) or []
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _cache_source(self, source, count, pages):
+        """Cache the pages of a source if none failed and none is short."""
+        if None in pages.values():
+            self._source_cache.pop(source, None)
+            return
+        content_list = [item for _, page in sorted(pages.items())
+                        for item in page]
+        if len(content_list) == count:
+            self._source_cache[source] = (count, content_list)
+        else:
+            self._source_cache.pop(source, None)
+
+    def iter_source_list(self):
+        """Yield the content items of every source as pages arrive.
+
+           Items come in arrival order, not in the order of the TV.
+        """
+        for _, content_list in self._iter_source_pages():
+            for content_item in content_list:
+                yield content_item
+
+    @_with_deadline
+    def load_source_list(self, refresh=False):
+        """ Load source list from Sony Bravia.
+
+            The list is cached for source_list_ttl seconds unless refresh is
+            set. When it expires only the TV sources whose content count
+            changed are fetched again, refresh fetches all of them.
+        """
+        if not refresh and self._content_mapping and \
+           time.monotonic() - self._source_list_time < self._source_list_ttl:
+            return self._content_mapping
+        if refresh:
+            self.invalidate_responses(['getSourceList'])
+            self._source_cache.clear()
+        return self._flight.do('source_list', self._fetch_source_list)
+
+    def _fetch_source_list(self):
+        original_content_list = []
+        for _, content_list in sorted(self._iter_source_pages(),
+                                      key=lambda page: page[0]):
+            original_content_list.extend(content_list)
+
+        content_mapping = self._build_content_mapping(original_content_list)
+        # set first, readers test the mapping then its age
+        self._source_list_time = time.monotonic()
+        self._content_mapping = content_mapping
+        return content_mapping
 
     def get_playing_info(self):
         """Get information on program that is shown on TV."""
-        return_value = {}
         resp = self.bravia_req_json("sony/avContent",
                                     self._jdata_build("getPlayingContentInfo"))
+        return self._parse_playing_info(resp)
 
-        if resp is not None and not resp.get('error'):
-            playing = resp.get('result')[0]
-            return_value['programTitle'] = playing.get('programTitle')
-            return_value['title'] = playing.get('title')
-            return_value['programMediaType'] = playing.get('programMediaType')
-            return_value['dispNum'] = playing.get('dispNum')
-            return_value['source'] = playing.get('source')
-            return_value['uri'] = playing.get('uri')
-            return_value['durationSec'] = playing.get('durationSec')
-            return_value['startDateTime'] = playing.get('startDateTime')
-        return return_value
+    def get_playback_clock(self):
+        """Get the PlaybackClock of the programme shown, None without one.
+
+           The clock is seeded by get_playing_info and the TV is only asked
+           again once the programme is over, at most every
+           CLOCK_SYNC_INTERVAL seconds, or when get_playing_info or
+           update_playback_clock see another programme.
+        """
+        if self._clock_stale():
+            self.get_playing_info()
+        return self._clock
 
     def get_system_info(self):
         """Get info on TV."""
-        return_value = {}
         resp = self.bravia_req_json("sony/system",
                                     self._jdata_build("getSystemInformation"))
-        if resp is not None and not resp.get('error'):
-            system_content_data = resp.get('result')[0]
-            return_value['name'] = system_content_data.get('name')
-            return_value['model'] = system_content_data.get('model')
-            return_value['language'] = system_content_data.get('language')
-        return return_value
+        return self._parse_system_info(resp)
 
     def get_network_info(self):
-        """Get info on network."""
-        return_value = {}
+        """Get info on network.
+
+           The MAC and subnet are remembered to turn the TV on later."""
         resp = self.bravia_req_json("sony/system",
                                     self._jdata_build("getNetworkSettings"))
-        if resp is not None and not resp.get('error'):
-            network_content_data = resp.get('result')[0]
-            return_value['mac'] = network_content_data[0]['hwAddr']
-            return_value['ip'] = network_content_data[0]['ipAddrV4']
-            return_value['gateway'] = network_content_data[0]['gateway']
-        return return_value
+        network_info = self._parse_network_info(resp)
+        self._remember_network_info(network_info)
+        return network_info
 
     def get_power_status(self):
         """Get power status: off, active, standby.
@@ -320,141 +1179,247 @@ class BraviaRC(object):
 
         return_value = 'off'
         try:
-            resp = self.bravia_req_json("sony/system",
-                                        self._jdata_build("getPowerStatus"),
-                                        False)
-            if resp is not None and not resp.get('error'):
-                power_data = resp.get('result')[0]
-                return_value = power_data.get('status')
-        except:  # pylint: disable=broad-except
-            pass
+            power_status = self._query_power_status()
+            if power_status != POWER_UNREACHABLE:
+                return_value = power_status
+        except Exception:  # pylint: disable=broad-except
+            if self._raise_errors:
+                raise
         return return_value
 
+    def _query_power_status(self):
+        """Get power status, POWER_UNREACHABLE if the TV does not answer."""
+        resp = self.bravia_req_json("sony/system",
+                                    self._jdata_build("getPowerStatus"),
+                                    False)
+        if resp is None:
+            return POWER_UNREACHABLE
+        return self._parse_power_status(resp)
+
+    @_with_deadline
+    def get_state(self):
+        """Get power status, playing info and volume info at once.
+
+           Returns a BraviaState. The three requests are sent concurrently
+           while the TV is known to be active; otherwise only the power
+           status is queried first and playing and volume are left empty
+           unless the TV turns out to be active. Unlike get_power_status,
+           the power is POWER_UNREACHABLE when the TV does not answer.
+        """
+        playing = volume = None
+        if self._last_power_status == 'active':
+            power = self._submit(self._query_power_status)
+            playing = self._submit(self.get_playing_info)
+            volume = self._submit(self.get_volume_info)
+            power_status = power.result()
+        else:
+            power_status = self._query_power_status()
+            if power_status == 'active':
+                playing = self._submit(self.get_playing_info)
+                volume = self._submit(self.get_volume_info)
+        self._last_power_status = power_status
+
+        if power_status != 'active':
+            return BraviaState(power_status, PlayingInfo(), None)
+        return BraviaState(power_status, playing.result(), volume.result())
+
+    def invalidate_commands(self):
+        super(BraviaRC, self).invalidate_commands()
+        self.invalidate_responses(['getRemoteControllerInfo'])
+
     def _refresh_commands(self):
+        self._flight.do('commands', self._fetch_commands)
 
-        jdata = self._jdata_build("getRemoteControllerInfo")
+    def _fetch_commands(self):
+        system_info = None
+        if self._command_cache is not None:
+            system_info = self._submit(self.get_system_info)
         resp = self.bravia_req_json("sony/system", self._jdata_build("getRemoteControllerInfo", None))
-        if resp is not None and not resp.get('error'):
-            self._commands = resp.get('result')[1]
-        else:
-            _LOGGER.error("JSON request error: " + json.dumps(resp, indent=4))
+        self._update_commands(self._parse_commands(resp),
+                              system_info and system_info.result())
 
     def get_command_code(self, command_name):
-        if len(self._commands) == 0:
+        if self._commands_expired():
             self._refresh_commands()
-        for command_data in self._commands:
-            if command_data.get('name') == command_name:
-                return command_data.get('value')
-        return None
+        return self._commands.get(command_name)
 
     def get_volume_info(self):
         """Get volume info."""
         resp = self.bravia_req_json("sony/audio",
                                     self._jdata_build("getVolumeInformation",
                                                       None))
-        if not resp.get('error'):
-            results = resp.get('result')[0]
-            for result in results:
-                if result.get('target') == 'speaker':
-                    return result
-        else:
-            _LOGGER.error("JSON request error:" + json.dumps(resp, indent=4))
-        return None
+        return self._parse_volume_info(resp)
 
     def set_volume_level(self, volume):
         """Set volume level, range 0..1."""
-        api_volume = str(int(round(volume * 100)))
-        payload = {"target": "speaker", "volume": api_volume}
-        self.bravia_req_json("sony/audio",
-                             self._jdata_build("setAudioVolume", payload))
+        return self.bravia_req_json("sony/audio",
+                                    self._volume_jdata_build(volume))
+
+    def set_mute(self, mute):
+        """Mute or unmute the speakers."""
+        return self.bravia_req_json("sony/audio",
+                                    self._mute_jdata_build(mute))
+
+    def _get_dial_apps(self, log_errors=True):
+        """Get the (name, id) pairs of the DIAL app list, None on error."""
+        headers = self._headers
+        if self._apps.etag is not None:
+            headers = dict(headers)
+            headers['If-None-Match'] = self._apps.etag
+        try:
+            cookies = self._auth_cookie()
+            response = self._request('GET', 'DIAL/sony/applist',
+                                     label='getAppList',
+                                     cookies=cookies, headers=headers)
+            if response.status_code == 304:
+                return self._apps.dial_apps()
+            return self._apps.parse_dial(response.content,
+                                         response.headers.get('ETag'))
+        except HTTPError as exception_instance:
+            self._on_error("HTTPError: ", exception_instance, log_errors)
 
-    def _recreate_auth_cookie(self):
-        """
-        The default cookie is for URL/sony.
-        For some commands we need it for the root path
+        except Exception as exception_instance:  # pylint: disable=broad-except
+            self._on_error("Exception: ", exception_instance, log_errors)
+
+    def load_apps(self, refresh=False, log_errors=True):
+        """Get the AppCatalogue of the installed apps.
+
+           It is fetched again once older than app_list_ttl or with
+           refresh: the DIAL app list and getApplicationList are requested
+           concurrently and merged. A list that cannot be fetched keeps
+           its previous apps.
         """
-        cookies = requests.cookies.RequestsCookieJar()
-        cookies.set("auth", self._cookies.get("auth"))
-        return cookies
+        if not refresh and not self._apps.expired():
+            return self._apps
+        return self._flight.do('apps', self._fetch_apps, log_errors)
+
+    def _fetch_apps(self, log_errors):
+        control_apps = self._submit(
+            self.bravia_req_json, "sony/appControl",
+            self._jdata_build("getApplicationList", None), log_errors)
+        dial_apps = self._get_dial_apps(log_errors)
+        self._apps.update(dial_apps,
+                          self._parse_application_list(control_apps.result()))
+        return self._apps
 
     def load_app_list(self, log_errors=True):
         """Get the list of installed apps"""
-        headers = {}
-
-        if self._psk is not None:
-            headers['X-Auth-PSK'] = self._psk
-
-        parsed_objects = {}
-
-        url = 'http://{}/DIAL/sony/applist'.format(self._host)
-
-        try:
-            cookies = self._recreate_auth_cookie()
-            response = requests.get(url, cookies=cookies, timeout=TIMEOUT,
-                                    headers=headers)
-        except requests.exceptions.HTTPError as exception_instance:
-            if log_errors:
-                _LOGGER.error("HTTPError: " + str(exception_instance))
-
-        except Exception as exception_instance:  # pylint: disable=broad-except
-            if log_errors:
-                _LOGGER.error("Exception: " + str(exception_instance))
-        else:
-            content = response.content
-            from xml.dom import minidom
-            parsed_xml = minidom.parseString(content)
-            for obj in parsed_xml.getElementsByTagName("app"):
-                if obj.getElementsByTagName("name")[0].firstChild and \
-                   obj.getElementsByTagName("id")[0].firstChild:
-                    name = obj.getElementsByTagName("name")[0]
-                    id_elm = obj.getElementsByTagName("id")[0]
-                    parsed_objects[str(name.firstChild.nodeValue)] = \
-                        str(id_elm.firstChild.nodeValue)
-
-        return parsed_objects
+        return dict((app.title, app.dial_id) for app in
+                    self.load_apps(refresh=True, log_errors=log_errors)
+                    if app.dial_id is not None)
 
+    @_with_deadline
     def start_app(self, app_name, log_errors=True):
-        """Start an app by name"""
-        if len(self._app_list) == 0:
-            self._app_list = self.load_app_list(log_errors=log_errors)
-        if app_name in self._app_list:
-            return self._start_app(self._app_list[app_name],
-                                   log_errors=log_errors)
+        """Start an app by name.
+
+           The name is looked up in the app catalogue ignoring case. When
+           it is not there the catalogue is fetched again once, so newly
+           installed apps are found, before allowing close matches.
+        """
+        refreshed = self._apps.expired()
+        apps = self.load_apps(log_errors=log_errors)
+        app = apps.get(app_name)
+        if app is None and not refreshed:
+            apps = self.load_apps(refresh=True, log_errors=log_errors)
+            app = apps.get(app_name)
+        if app is None:
+            app = apps.find(app_name)
+        if app is None:
+            return None
+        if app.dial_id is not None:
+            return self._start_app(app.dial_id, log_errors=log_errors)
+        return self.bravia_req_json("sony/appControl",
+                                    self._jdata_build("setActiveApp",
+                                                      {"uri": app.uri}),
+                                    log_errors)
 
     def _start_app(self, app_id, log_errors=True):
         """Start an app by id"""
-        headers = {}
-
-        if self._psk is not None:
-            headers['X-Auth-PSK'] = self._psk
-
-        url = 'http://{}/DIAL/apps/{}'.format(self._host, app_id)
-
         try:
-            cookies = self._recreate_auth_cookie()
-            response = requests.post(url, cookies=cookies, timeout=TIMEOUT,
-                                     headers=headers)
-        except requests.exceptions.HTTPError as exception_instance:
-            if log_errors:
-                _LOGGER.error("HTTPError: " + str(exception_instance))
+            cookies = self._auth_cookie()
+            response = self._request('POST', 'DIAL/apps/{}'.format(app_id),
+                                     endpoint='DIAL/apps', label='startApp',
+                                     cookies=cookies, headers=self._headers)
+        except HTTPError as exception_instance:
+            self._on_error("HTTPError: ", exception_instance, log_errors)
 
         except Exception as exception_instance:  # pylint: disable=broad-except
-            if log_errors:
-                _LOGGER.error("Exception: " + str(exception_instance))
+            self._on_error("Exception: ", exception_instance, log_errors)
         else:
             content = response.content
             return content
 
-    def turn_on(self):
-        """Turn the media player on."""
-        self._wakeonlan()
-        # Try using the power on command incase the WOL doesn't work
-        if self.get_power_status() != 'active':
-            command = self.get_command_code('TvPower')
-            if command is None:
-                command = 'AAAAAQAAAAEAAAAuAw=='
-            self.send_req_ircc(command)
+    def _send_power_on(self):
+        """Ask a TV in network standby to power on.
 
+           setPowerStatus and the IRCC WakeUp command are sent concurrently,
+           returns their futures.
+        """
+        command = self._commands.get('WakeUp', WAKEUP_CODE)
+        return [self._submit(self.bravia_req_json, "sony/system",
+                             self._jdata_build("setPowerStatus",
+                                               {"status": True}), False),
+                self._submit(self.send_req_ircc, command, False)]
+
+    @staticmethod
+    def _power_on_answered(futures):
+        """Whether the TV answered one of the requests of _send_power_on."""
+        for future in futures:
+            try:
+                if future.result() is not None:
+                    return True
+            except BraviaRCError:
+                pass
+        return False
+
+    def _poll_power_status(self):
+        self.invalidate_responses(['getPowerStatus'])
+        try:
+            with self.deadline(WAKE_POLL_TIMEOUT):
+                return self._query_power_status()
+        except BraviaRCError:
+            return POWER_UNREACHABLE
+
+    @_with_deadline
+    def turn_on(self, poll_interval=WAKE_POLL_INTERVAL):
+        """Turn the media player on and wait until it is active.
+
+           Bursts of Wake-on-LAN packets are sent every poll_interval
+           seconds while setPowerStatus and the IRCC WakeUp command are
+           sent concurrently, until the TV answers, and the power status
+           is polled with short timeouts. Returns the seconds it took the
+           TV to be active, or None if it was not before the turn_on
+           deadline.
+        """
+        start = time.monotonic()
+        end = getattr(self._local, 'deadline', None)
+        if end is None:
+            end = start + DEFAULT_DEADLINES['turn_on']
+        # the TV is expected to answer again
+        if self._breaker is not None:
+            self._breaker.reset()
+        power_on = None
+        while True:
+            try:
+                self._wakeonlan(WOL_BURST)
+            except OSError as exception_instance:
+                _LOGGER.debug("Wake-on-LAN failed: %s", exception_instance)
+            if power_on is None or (
+                    all(future.done() for future in power_on) and
+                    not self._power_on_answered(power_on)):
+                power_on = self._send_power_on()
+            # poll right after a TV in network standby answered
+            wait(power_on, timeout=WAKE_POLL_TIMEOUT)
+            if self._poll_power_status() == 'active':
+                self._last_power_status = 'active'
+                return time.monotonic() - start
+            if self._breaker is not None:
+                self._breaker.reset()
+            if time.monotonic() + poll_interval >= end:
+                return None
+            time.sleep(poll_interval)
+
+    @_with_deadline
     def turn_on_command(self):
         """Turn the media player on using command.
 
@@ -482,20 +1447,19 @@ class BraviaRC(object):
         """Send mute command."""
         self.send_req_ircc(self.get_command_code('Mute'))
 
+    @_with_deadline
     def select_source(self, source):
         """Set the input source."""
-        if len(self._content_mapping) == 0:
-            self._content_mapping = self.load_source_list()
-        if source in self._content_mapping:
-            uri = self._content_mapping[source]
-            self.play_content(uri)
+        content_mapping = self.load_source_list()
+        if source not in content_mapping:
+            content_mapping = self.load_source_list(refresh=True)
+        if source in content_mapping:
+            uri = content_mapping[source]
+            return self.play_content(uri)
 
     def play_content(self, uri):
         """Play content by URI."""
-        if uri.startswith("com.sony.dtv"):
-            self.bravia_req_json("sony/appControl", self._jdata_build("setActiveApp", {"uri": uri}))
-        else:
-            self.bravia_req_json("sony/avContent", self._jdata_build("setPlayContent", {"uri": uri}))
+        return self.bravia_req_json(*self._play_content_build(uri))
 
     def media_play(self):
         """Send play command."""
@@ -517,57 +1481,6 @@ class BraviaRC(object):
         """Send the previous track command."""
         self.send_req_ircc(self.get_command_code('Prev'))
 
-    def calc_time(self, *times):
-        """Calculate the sum of times, value is returned in HH:MM."""
-        total_secs = 0
-        for tms in times:
-            time_parts = [int(s) for s in tms.split(':')]
-            total_secs += (time_parts[0] * 60 + time_parts[1]) * 60 + \
-                time_parts[2]
-        total_secs, sec = divmod(total_secs, 60)
-        hour, minute = divmod(total_secs, 60)
-        if hour >= 24:  # set 24:10 to 00:10
-            hour -= 24
-        return ("%02d:%02d" % (hour, minute))
-
-    def playing_time(self, startdatetime, durationsec):
-        """Give starttime, endtime and percentage played.
-
-        Start time format: 2017-03-24T00:00:00+0100
-        Using that, we calculate number of seconds to end time.
-        """
-
-        date_format = "%Y-%m-%dT%H:%M:%S"
-        now = datetime.now()
-        stripped_tz = startdatetime[:-5]
-        start_date_time = datetime.strptime(stripped_tz, date_format)
-        start_time = (time.strptime(stripped_tz, date_format))
-
-        try:
-            playingtime = now - start_date_time
-        except TypeError:
-            playingtime = now - datetime(*start_time[0:6])
-
-        try:
-            starttime = datetime.time(start_date_time)
-        except TypeError:
-            starttime = datetime.time(datetime(*start_time[0:6]))
-
-        duration = time.strftime('%H:%M:%S', time.gmtime(durationsec))
-        endtime = self.calc_time(str(starttime), str(duration))
-        starttime = starttime.strftime('%H:%M')
-        perc_playingtime = int(round(((playingtime.seconds / durationsec) *
-                                      100), 0))
-
-        return_value = {}
-
-        return_value['start_time'] = starttime
-        return_value['end_time'] = endtime
-        return_value['media_position'] = playingtime.seconds
-        return_value['media_position_perc'] = perc_playingtime
-
-        return return_value
-    
     def get_led_status(self):
         """Get LED status: off, active, standby.
            By default the TV is turned off."""
@@ -580,8 +1493,9 @@ class BraviaRC(object):
             if resp is not None and not resp.get('error'):
                 led_data = resp.get('result')[0]
                 return_value = led_data.get('mode')
-        except:  # pylint: disable=broad-except
-            pass
+        except Exception:  # pylint: disable=broad-except
+            if self._raise_errors:
+                raise
         return return_value
 
     def set_led_status(self, mode, status):
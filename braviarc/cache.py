@@ -0,0 +1,211 @@
+"""
+On-disk cache of the remote controller command tables and in-memory cache of
+the API responses.
+"""
+import collections
+import json
+import logging
+import os
+import threading
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache',
+                                  'braviarc', 'commands.json')
+
+RESPONSE_CACHE_SIZE = 256
+# seconds a response is cached
+STATIC = 3600
+SHORT = 1
+NEVER = 0
+
+# JSON-RPC getter: TTL, the others are never cached
+RESPONSE_TTLS = {
+    'getSystemInformation': STATIC,
+    'getNetworkSettings': STATIC,
+    'getInterfaceInformation': STATIC,
+    'getRemoteControllerInfo': STATIC,
+    'getSourceList': STATIC,
+    'getSchemeList': STATIC,
+    'getPowerStatus': SHORT,
+    'getVolumeInformation': SHORT,
+    'getPlayingContentInfo': SHORT,
+}
+
+_STATE = ('getPowerStatus', 'getPlayingContentInfo', 'getVolumeInformation')
+
+# mutating JSON-RPC method or request label: getters it makes stale
+INVALIDATES = {
+    'setAudioVolume': ('getVolumeInformation',),
+    'setAudioMute': ('getVolumeInformation',),
+    'setPlayContent': ('getPlayingContentInfo',),
+    'setActiveApp': ('getPlayingContentInfo',),
+    'startApp': ('getPlayingContentInfo',),
+    'setPowerStatus': _STATE,
+    # a remote key can change any of them
+    'X_SendIRCC': _STATE,
+}
+
+
+def read_json_file(path, description):
+    """Return the JSON document of path, {} if it is missing or invalid."""
+    try:
+        with open(path) as json_file:
+            return json.load(json_file)
+    except (IOError, OSError, ValueError) as exception_instance:
+        if os.path.exists(path):
+            _LOGGER.warning("Ignoring %s %s: %s", description, path,
+                            exception_instance)
+        return {}
+
+
+def write_json_file(path, data, description):
+    """Replace path by data as JSON, atomically and readable by its owner
+       only."""
+    import tempfile
+
+    directory = os.path.dirname(path) or '.'
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # mkstemp creates the file with mode 0600
+        handle, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(handle, 'w') as json_file:
+                json.dump(data, json_file)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    except (IOError, OSError) as exception_instance:
+        _LOGGER.warning("Unable to write %s %s: %s", description, path,
+                        exception_instance)
+
+
+class CommandCache(object):
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        """Command tables persisted as JSON in path.
+
+           Tables are stored once per model/firmware and every host points
+           to the table of its model, so TVs of the same model share it.
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        self._data = None
+
+    def _read(self):
+        if self._data is None:
+            self._data = read_json_file(self._path, 'command cache')
+            self._data.setdefault('hosts', {})
+            self._data.setdefault('models', {})
+        return self._data
+
+    def _write(self):
+        write_json_file(self._path, self._data, 'command cache')
+
+    def load(self, host):
+        """Return (timestamp, commands) cached for host, or None."""
+        with self._lock:
+            data = self._read()
+            entry = data['models'].get(data['hosts'].get(host))
+            if entry is None:
+                return None
+            return entry['timestamp'], entry['commands']
+
+    def store(self, host, model, commands, timestamp):
+        """Save the commands of host, whose model/firmware key is model."""
+        with self._lock:
+            data = self._read()
+            data['hosts'][host] = model
+            data['models'][model] = {'timestamp': timestamp,
+                                     'commands': commands}
+            self._write()
+
+    def forget(self, host):
+        """Drop the table used by host."""
+        with self._lock:
+            data = self._read()
+            model = data['hosts'].pop(host, None)
+            if model is not None:
+                data['models'].pop(model, None)
+                for other, other_model in list(data['hosts'].items()):
+                    if other_model == model:
+                        del data['hosts'][other]
+            self._write()
+
+
+class ResponseCache(object):
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttls=None,
+                 invalidates=None):
+        """In-memory cache of the decoded JSON-RPC responses of getters.
+
+           ttls maps JSON-RPC methods to the seconds their responses are
+           kept, over RESPONSE_TTLS; methods without a TTL are never
+           cached. invalidates maps mutating methods or request labels to
+           the getters whose responses they make stale, over INVALIDATES.
+           At most max_entries responses are kept, the least recently used
+           are evicted first.
+        """
+        self._max_entries = max_entries
+        self._ttls = dict(RESPONSE_TTLS)
+        self._ttls.update(ttls or {})
+        self._invalidates = dict(INVALIDATES)
+        self._invalidates.update(invalidates or {})
+        self._lock = threading.Lock()
+        # key: (expiry, method, response), least recently used first
+        self._entries = collections.OrderedDict()
+        # method: number of invalidations, to drop responses fetched
+        # while a mutating request was in flight
+        self._generations = collections.Counter()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def ttl(self, method):
+        return self._ttls.get(method, NEVER)
+
+    def stale_methods(self, label):
+        """Getters made stale by the request label, may be empty."""
+        return self._invalidates.get(label, ())
+
+    def generation(self, method):
+        return self._generations[method]
+
+    def get(self, key, method):
+        """Return the response cached under key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def put(self, key, method, response, generation):
+        """Cache response unless method was invalidated since generation."""
+        ttl = self.ttl(method)
+        if not ttl:
+            return
+        with self._lock:
+            if self._generations[method] != generation:
+                return
+            self._entries[key] = (time.monotonic() + ttl, method, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, methods=None):
+        """Drop the responses of methods, all of them without methods."""
+        with self._lock:
+            if methods is None:
+                methods = set(entry[1] for entry in self._entries.values())
+            for method in methods:
+                self._generations[method] += 1
+            for key, entry in list(self._entries.items()):
+                if entry[1] in methods:
+                    del self._entries[key]
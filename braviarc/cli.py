@@ -0,0 +1,344 @@
+"""
+Command-line interface of braviarc.
+
+    braviarc -H 192.168.1.25 --psk 0000 call get_power_status
+    braviarc -i tvs.json --json state
+    braviarc -i tvs.json send Home 'Down x2' Confirm
+    braviarc -i tvs.json watch
+    braviarc -H 192.168.1.25 --psk 0000 bench -n 50
+    braviarc discover --subnet 192.168.0.0/22 > tvs.json
+    braviarc -i tvs.json proxy --port 8080
+
+The inventory is a JSON list of objects with the BraviaRC arguments host,
+psk and mac plus an optional name, or a text file with one
+``host [psk [mac]]`` per line. -H selects hosts or names of the inventory,
+or adds hosts to it.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .braviarc import BraviaRC
+from .discovery import discover
+from .fleet import BraviaFleet
+from .poller import BraviaPoller
+from .proxy import BraviaProxy
+
+DEADLINE = 30
+
+# API, BraviaRC method sending it
+BENCH_CALLS = [
+    ('getPowerStatus', 'get_power_status'),
+    ('getSystemInformation', 'get_system_info'),
+    ('getNetworkSettings', 'get_network_info'),
+    ('getPlayingContentInfo', 'get_playing_info'),
+    ('getVolumeInformation', 'get_volume_info'),
+    ('getAppList', 'load_app_list'),
+]
+
+
+def load_inventory(path):
+    """Return the list of BraviaRC argument dicts of an inventory file."""
+    with open(path) as inventory_file:
+        content = inventory_file.read()
+    if content.lstrip().startswith('['):
+        return json.loads(content)
+    inventory = []
+    for line in content.splitlines():
+        fields = line.split('#', 1)[0].split()
+        if fields:
+            inventory.append(dict(zip(('host', 'psk', 'mac'), fields)))
+    return inventory
+
+
+def select_hosts(inventory, selection, psk=None, keep_names=False):
+    """Return the entries of inventory selected by host or name."""
+    entries = [dict((key, entry[key]) for key in ('host', 'psk', 'mac', 'name')
+                    if entry.get(key) is not None) for entry in inventory]
+    if selection:
+        selected = []
+        for key in selection:
+            matches = [entry for entry in entries
+                       if key in (entry.get('host'), entry.get('name'))]
+            selected.extend(matches or [{'host': key}])
+        entries = selected
+    for entry in entries:
+        if psk is not None:
+            entry.setdefault('psk', psk)
+        if not keep_names:
+            entry.pop('name', None)
+    return entries
+
+
+def to_json(value):
+    """Convert results (models, namedtuples, bytes) to JSON values."""
+    if hasattr(value, '_asdict'):
+        return dict((key, to_json(item))
+                    for key, item in value._asdict().items())
+    if hasattr(value, 'keys'):
+        return dict((key, to_json(value[key])) for key in value.keys())
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    if isinstance(value, Exception):
+        return '{}: {}'.format(type(value).__name__, value)
+    return value
+
+
+def parse_value(text):
+    """Command-line argument as JSON when it is valid JSON, else a string."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+    return samples[index]
+
+
+def _print_results(results, args):
+    if args.json:
+        print(json.dumps(dict(
+            (host, {'ok': result.ok, 'value': to_json(result.value),
+                    'error': to_json(result.error),
+                    'elapsed': result.elapsed})
+            for host, result in results.items()), indent=2))
+    else:
+        for host, result in results.items():
+            if result.ok:
+                print('{}: {}'.format(host, json.dumps(to_json(
+                    result.value))))
+            else:
+                print('{}: ERROR {}'.format(host, result.error))
+    return 0 if all(result.ok for result in results.values()) else 1
+
+
+def _fleet_call(args, method, *call_args):
+    with BraviaFleet(args.hosts, max_workers=args.workers,
+                     deadline=args.deadline) as fleet:
+        return _print_results(fleet.call(method, *call_args), args)
+
+
+def cmd_call(args):
+    return _fleet_call(args, args.method,
+                       *[parse_value(value) for value in args.args])
+
+
+def cmd_state(args):
+    return _fleet_call(args, 'get_state')
+
+
+def cmd_send(args):
+    return _fleet_call(args, 'send_sequence', args.keys, args.interval)
+
+
+def cmd_watch(args):
+    lock = threading.Lock()
+    last = {}
+
+    def changed(polled):
+        state = to_json(polled.state)
+        with lock:
+            if last.get(polled.host) == state:
+                return
+            last[polled.host] = state
+            if args.json:
+                print(json.dumps({'host': polled.host, 'time': polled.updated,
+                                  'state': state,
+                                  'failures': polled.failures}))
+            else:
+                print('{} {}: {}'.format(
+                    time.strftime('%H:%M:%S',
+                                  time.localtime(polled.updated)),
+                    polled.host, json.dumps(state)))
+            sys.stdout.flush()
+
+    poller = BraviaPoller.from_hosts(args.hosts, interval=args.interval,
+                                     standby_interval=args.interval,
+                                     max_workers=args.workers,
+                                     callback=changed)
+    with poller:
+        try:
+            if args.duration is None:
+                while True:
+                    time.sleep(3600)
+            time.sleep(args.duration)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+def _bench_host(entry, iterations):
+    with BraviaRC(raise_errors=True, response_cache=False, **entry) as tv:
+        report = {}
+        for name, method in BENCH_CALLS:
+            samples = []
+            errors = 0
+            for _ in range(iterations):
+                start = time.perf_counter()
+                try:
+                    getattr(tv, method)()
+                except Exception:  # pylint: disable=broad-except
+                    errors += 1
+                samples.append(time.perf_counter() - start)
+            report[name] = {
+                'p50': percentile(samples, 0.5),
+                'p90': percentile(samples, 0.9),
+                'p99': percentile(samples, 0.99),
+                'max': max(samples), 'errors': errors}
+        return report
+
+
+def cmd_bench(args):
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [(entry['host'], executor.submit(_bench_host, entry,
+                                                   args.iterations))
+                   for entry in args.hosts]
+        reports = dict((host, future.result()) for host, future in futures)
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return 0
+    for host, report in reports.items():
+        print(host)
+        print("  {:<24} {:>8} {:>8} {:>8} {:>8} {:>6}  (ms)".format(
+            'API', 'p50', 'p90', 'p99', 'max', 'errors'))
+        for name, stats in report.items():
+            print("  {:<24} {:>8.2f} {:>8.2f} {:>8.2f} {:>8.2f} {:>6}".format(
+                name, *([stats[key] * 1000
+                         for key in ('p50', 'p90', 'p99', 'max')] +
+                        [stats['errors']])))
+    return 0
+
+
+def cmd_discover(args):
+    inventory = []
+    for device in discover(subnets=args.subnet, ssdp=not args.no_ssdp,
+                           timeout=args.timeout, psk=args.psk,
+                           port=args.port):
+        inventory.append({'host': device.host, 'mac': device.mac,
+                          'name': device.name, 'model': device.model,
+                          'via': device.via})
+        if not args.json:
+            sys.stderr.write('found {} {} ({})\n'.format(
+                device.host, device.model, device.via))
+    print(json.dumps(inventory, indent=2))
+    return 0
+
+
+def cmd_proxy(args):
+    tvs = dict((entry.pop('name', entry['host']), entry)
+               for entry in select_hosts(args.inventory_entries, args.host,
+                                         args.psk, keep_names=True))
+    try:
+        proxy = BraviaProxy(tvs, address=(args.bind, args.port),
+                            unix_socket=args.unix_socket,
+                            poll_interval=args.interval,
+                            max_workers=args.workers,
+                            session_store=args.session_store,
+                            allow_remote=args.allow_remote)
+    except ValueError as exception_instance:
+        sys.stderr.write('{}, see --allow-remote\n'.format(
+            exception_instance))
+        return 2
+    with proxy:
+        sys.stderr.write('serving {} on {}\n'.format(
+            ', '.join(sorted(tvs)), proxy.address))
+        try:
+            proxy.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='braviarc', description='Control Sony Bravia TVs.')
+    parser.add_argument('-H', '--host', action='append', default=[],
+                        help='host or inventory name, can be repeated')
+    parser.add_argument('-i', '--inventory', help='inventory file')
+    parser.add_argument('--psk', help='pre-shared key of the hosts '
+                                      'without one in the inventory')
+    parser.add_argument('--json', action='store_true',
+                        help='print JSON')
+    parser.add_argument('--deadline', type=float, default=DEADLINE,
+                        help='seconds to wait for each host')
+    parser.add_argument('--workers', type=int, default=32,
+                        help='hosts handled concurrently')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    call = subparsers.add_parser('call', help='call a BraviaRC method, '
+                                              'e.g. set_volume_level 0.2')
+    call.add_argument('method')
+    call.add_argument('args', nargs='*', help='JSON values or strings')
+    call.set_defaults(function=cmd_call)
+
+    state = subparsers.add_parser('state', help='power, playing and volume')
+    state.set_defaults(function=cmd_state)
+
+    send = subparsers.add_parser('send', help='send a key sequence, '
+                                              'e.g. Home "Down x2" Confirm')
+    send.add_argument('keys', nargs='+')
+    send.add_argument('--interval', type=int, default=100,
+                      help='milliseconds between keys')
+    send.set_defaults(function=cmd_send)
+
+    watch = subparsers.add_parser('watch', help='print state changes')
+    watch.add_argument('--interval', type=float, default=5,
+                       help='seconds between polls')
+    watch.add_argument('--duration', type=float,
+                       help='seconds to watch, forever by default')
+    watch.set_defaults(function=cmd_watch)
+
+    bench = subparsers.add_parser('bench', help='measure the round trip '
+                                                'of each API')
+    bench.add_argument('-n', '--iterations', type=int, default=20)
+    bench.set_defaults(function=cmd_bench)
+
+    discover_parser = subparsers.add_parser(
+        'discover', help='find TVs and print a JSON inventory')
+    discover_parser.add_argument('--subnet', action='append', default=[],
+                                 help='subnet to probe, e.g. 10.0.0.0/22')
+    discover_parser.add_argument('--no-ssdp', action='store_true',
+                                 help='do not send SSDP M-SEARCH')
+    discover_parser.add_argument('--timeout', type=float, default=5)
+    discover_parser.add_argument('--port', type=int, default=80)
+    discover_parser.set_defaults(function=cmd_discover, needs_hosts=False)
+
+    proxy = subparsers.add_parser('proxy', help='serve the TVs to local '
+                                                'clients, by name')
+    proxy.add_argument('--bind', default='127.0.0.1',
+                       help='loopback address to listen on')
+    proxy.add_argument('--allow-remote', action='store_true',
+                       help='allow a --bind address reachable by other '
+                            'hosts, which control the TVs without a PSK')
+    proxy.add_argument('--port', type=int, default=8080)
+    proxy.add_argument('--unix-socket', help='listen on a Unix socket '
+                                             'instead')
+    proxy.add_argument('--interval', type=float, default=5,
+                       help='seconds between state polls')
+    proxy.add_argument('--session-store', help='file of the auth cookies')
+    proxy.set_defaults(function=cmd_proxy)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    inventory = load_inventory(args.inventory) if args.inventory else []
+    args.inventory_entries = inventory
+    args.hosts = select_hosts(inventory, args.host, args.psk)
+    if not args.hosts and getattr(args, 'needs_hosts', True):
+        parser.error('no host, use -H or -i')
+    return args.function(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
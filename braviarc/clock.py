@@ -0,0 +1,114 @@
+"""
+Position of the programme playing on a Sony Bravia TV, computed locally.
+"""
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+_DATE_TIME_RE = re.compile(r'^(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)'
+                           r'(?:\.\d+)?(Z|[+-]\d\d:?\d\d)?$')
+
+
+def parse_date_time(text):
+    """Parse a startDateTime, e.g. 2017-03-24T00:00:00+0100.
+
+       Returns an aware datetime in the offset of the TV, a time without
+       offset is taken as local time.
+    """
+    match = _DATE_TIME_RE.match(text.strip())
+    if match is None:
+        raise ValueError('Invalid date time: {!r}'.format(text))
+    fields = [int(value) for value in match.groups()[:6]]
+    zone = match.group(7)
+    if zone is None:
+        return datetime(*fields).astimezone()
+    if zone == 'Z':
+        return datetime(*fields, tzinfo=timezone.utc)
+    offset = timedelta(hours=int(zone[1:3]), minutes=int(zone[-2:]))
+    if zone[0] == '-':
+        offset = -offset
+    return datetime(*fields, tzinfo=timezone(offset))
+
+
+class PlaybackClock(object):
+    """Start, end and position of a programme from one getPlayingContentInfo.
+
+       The position advances with the monotonic clock, so it is neither
+       re-polled nor affected by changes of the system time, and is
+       correct whatever the time zones of the TV and of this host. A
+       clock is a few floats: thousands can be kept and read every second.
+    """
+
+    __slots__ = ('start', 'end', 'duration', 'uri', 'start_date_time',
+                 'start_time', 'end_time', '_origin')
+
+    def __init__(self, start_date_time, duration_sec, uri=None):
+        self.start_date_time = start_date_time
+        self.start = parse_date_time(start_date_time)
+        self.end = self.start + timedelta(seconds=duration_sec)
+        self.duration = duration_sec
+        self.uri = uri
+        # HH:MM in the time zone of the TV
+        self.start_time = self.start.strftime('%H:%M')
+        self.end_time = self.end.strftime('%H:%M')
+        # monotonic time at which the programme started
+        self._origin = time.monotonic() - \
+            (time.time() - self.start.timestamp())
+
+    @classmethod
+    def from_playing_info(cls, playing_info):
+        """Return the clock of a PlayingInfo, None if it is not timed."""
+        if not playing_info:
+            return None
+        start_date_time = playing_info.get('startDateTime')
+        duration_sec = playing_info.get('durationSec')
+        if not start_date_time or duration_sec is None:
+            return None
+        try:
+            return cls(start_date_time, duration_sec,
+                       playing_info.get('uri'))
+        except ValueError:
+            return None
+
+    def __repr__(self):
+        return 'PlaybackClock({!r}, {!r}, {!r})'.format(
+            self.start_date_time, self.duration, self.uri)
+
+    def matches(self, playing_info):
+        """Whether playing_info is the programme of this clock."""
+        return bool(playing_info) and \
+            playing_info.get('uri') == self.uri and \
+            playing_info.get('startDateTime') == self.start_date_time and \
+            playing_info.get('durationSec') == self.duration
+
+    def position(self, now=None):
+        """Seconds played, within 0..duration.
+
+           now is a time.monotonic() value, the current one by default.
+        """
+        if now is None:
+            now = time.monotonic()
+        return max(0, min(self.duration, int(now - self._origin)))
+
+    def percentage(self, now=None):
+        if not self.duration:
+            return 0
+        return int(round(self.position(now) * 100.0 / self.duration))
+
+    def remaining(self, now=None):
+        return self.duration - self.position(now)
+
+    def ended(self, now=None):
+        """Whether the programme is over and the TV should be asked again."""
+        if now is None:
+            now = time.monotonic()
+        return now - self._origin >= self.duration
+
+    def as_dict(self, now=None):
+        """The dict returned by BraviaRCBase.playing_time."""
+        if now is None:
+            now = time.monotonic()
+        return {'start_time': self.start_time,
+                'end_time': self.end_time,
+                'media_position': self.position(now),
+                'media_position_perc': self.percentage(now)}
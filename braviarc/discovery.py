@@ -0,0 +1,190 @@
+"""
+Discovery of the Sony Bravia TVs of a network.
+
+    for device in discover(subnets=['192.168.0.0/22'], timeout=5):
+        tv = device.create(psk='0000')
+"""
+import collections
+import ipaddress
+import itertools
+import logging
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+from .braviarc import BraviaRC, BraviaRCError, create_session
+from .policy import RequestPolicy
+
+_LOGGER = logging.getLogger(__name__)
+
+DISCOVERY_TIMEOUT = 5
+PROBE_TIMEOUT = 0.5
+MAX_WORKERS = 128
+SSDP_ADDRESS = ('239.255.255.250', 1900)
+SSDP_MX = 2
+SSDP_TARGETS = ('urn:schemas-sony-com:service:ScalarWebAPI:1',
+                'urn:schemas-sony-com:service:IRCC:1')
+SSDP_REQUEST = ('M-SEARCH * HTTP/1.1\r\n'
+                'HOST: 239.255.255.250:1900\r\n'
+                'MAN: "ssdp:discover"\r\n'
+                'MX: {mx}\r\n'
+                'ST: {target}\r\n'
+                '\r\n')
+
+
+class DiscoveredDevice(collections.namedtuple('DiscoveredDevice',
+                                              ['host', 'mac', 'model', 'name',
+                                               'generation', 'via'])):
+    """TV found by SSDP ('ssdp') or by probing a subnet ('probe')."""
+
+    __slots__ = ()
+
+    def create(self, **kwargs):
+        """Return a BraviaRC for the TV, kwargs as for BraviaRC."""
+        kwargs.setdefault('mac', self.mac)
+        return BraviaRC(self.host, **kwargs)
+
+
+def _parse_ssdp_response(data, address):
+    """Return the host of a Sony SSDP response, or None."""
+    headers = {}
+    for line in data.decode('utf-8', 'replace').split('\r\n')[1:]:
+        key, _, value = line.partition(':')
+        headers[key.strip().upper()] = value.strip()
+    if 'sony' not in (headers.get('ST', '') + headers.get('USN', '')).lower():
+        return None
+    location = urlparse(headers.get('LOCATION', ''))
+    return location.hostname or address[0]
+
+
+def _ssdp_search(found, stop, interval=SSDP_MX):
+    """Put the hosts answering M-SEARCH in found until stop is set."""
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM,
+                             socket.IPPROTO_UDP)
+    except OSError as exception_instance:
+        _LOGGER.debug("SSDP unavailable: %s", exception_instance)
+        return
+    try:
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 2)
+        sock.settimeout(0.2)
+        next_search = 0
+        while not stop.is_set():
+            if time.monotonic() >= next_search:
+                for target in SSDP_TARGETS:
+                    sock.sendto(SSDP_REQUEST.format(
+                        mx=SSDP_MX, target=target).encode('ascii'),
+                        SSDP_ADDRESS)
+                next_search = time.monotonic() + interval
+            try:
+                data, address = sock.recvfrom(65507)
+            except socket.timeout:
+                continue
+            host = _parse_ssdp_response(data, address)
+            if host is not None:
+                found.put(host)
+    except OSError as exception_instance:
+        _LOGGER.debug("SSDP search failed: %s", exception_instance)
+    finally:
+        sock.close()
+
+
+def _identify(host, via, session, psk, probe_timeout):
+    """Return the DiscoveredDevice answering on host, or None."""
+    policy = RequestPolicy(probe_timeout, probe_timeout * 2, 0, 0)
+    tv = BraviaRC(host, psk=psk, session=session, raise_errors=True,
+                  circuit_breaker=False,
+                  policies={'getSystemInformation': policy,
+                            'getNetworkSettings': policy})
+    try:
+        resp = tv.bravia_req_json("sony/system", tv._jdata_build(  # pylint: disable=protected-access
+            "getSystemInformation"), False)
+        if not isinstance(resp, dict) or \
+           'result' not in resp and 'error' not in resp:
+            return None
+        # a JSON-RPC error, e.g. forbidden without psk, is still a TV
+        system_info = tv._parse_system_info(resp)  # pylint: disable=protected-access
+        try:
+            mac = tv.get_network_info().get('mac')
+        except BraviaRCError:
+            mac = None
+        return DiscoveredDevice(host, mac or system_info.get('macAddr'),
+                                system_info.get('model'),
+                                system_info.get('name'),
+                                system_info.get('generation'), via)
+    except BraviaRCError:
+        return None
+    finally:
+        tv.close()
+
+
+def discover(subnets=(), ssdp=True, timeout=DISCOVERY_TIMEOUT, psk=None,
+             port=80, max_workers=MAX_WORKERS, probe_timeout=PROBE_TIMEOUT):
+    """Yield a DiscoveredDevice per TV as soon as it is identified.
+
+       TVs answering an SSDP M-SEARCH for the ScalarWebAPI or IRCC services
+       are identified, and with subnets (e.g. '192.168.0.0/22') every
+       address is probed concurrently by max_workers threads, each probe
+       bounded by probe_timeout seconds. TVs are identified by
+       getSystemInformation and deduplicated by the MAC address from
+       getNetworkSettings. Discovery stops after timeout seconds.
+    """
+    end = time.monotonic() + timeout
+    session = create_session(pool_connections=max_workers, pool_maxsize=1)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    found = queue.Queue()
+    stop = threading.Event()
+    pending = set()
+    probed = set()
+    seen = set()
+
+    def submit(address, via):
+        host = address if port == 80 else '{}:{}'.format(address, port)
+        if host not in probed:
+            probed.add(host)
+            pending.add(executor.submit(_identify, host, via, session, psk,
+                                        probe_timeout))
+
+    if ssdp:
+        thread = threading.Thread(target=_ssdp_search, args=(found, stop),
+                                  name='BraviaSSDP')
+        thread.daemon = True
+        thread.start()
+    # submitted as workers free up, so that answers are not held back
+    addresses = itertools.chain.from_iterable(
+        ipaddress.ip_network(subnet, strict=False).hosts()
+        for subnet in subnets)
+    try:
+        while True:
+            while not found.empty():
+                submit(found.get_nowait(), 'ssdp')
+            for address in itertools.islice(
+                    addresses, max(0, 2 * max_workers - len(pending))):
+                submit(str(address), 'probe')
+            remaining = end - time.monotonic()
+            if remaining <= 0 or not pending and not ssdp:
+                break
+            if not pending:
+                # waiting for SSDP answers
+                time.sleep(min(remaining, 0.1))
+                continue
+            done, _ = wait(pending, timeout=min(remaining, 0.1),
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                device = future.result()
+                if device is None:
+                    continue
+                key = device.mac or device.host
+                if key not in seen:
+                    seen.add(key)
+                    yield device
+    finally:
+        stop.set()
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+        session.close()
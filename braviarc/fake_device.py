@@ -0,0 +1,273 @@
+"""
+In-process fake Sony Bravia TV for tests and benchmarks.
+
+Serves the JSON-RPC services (sony/system, sony/avContent, sony/audio,
+sony/appControl, sony/accessControl), the IRCC SOAP endpoint and the DIAL
+app list on a local port:
+
+    with FakeBraviaDevice(channels=1000, latency=0.02) as device:
+        tv = BraviaRC(device.host, psk='0000')
+"""
+import json
+import random
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+except ImportError:  # Python < 3.7
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+    class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+COMMANDS = ['PowerOff', 'TvPower', 'VolumeUp', 'VolumeDown', 'Mute',
+            'Home', 'Up', 'Down', 'Left', 'Right', 'Confirm', 'Return',
+            'Play', 'Pause', 'TvPause', 'Next', 'Prev', 'Input', 'Netflix']
+
+APPS = [('com.sony.dtv.netflix', 'Netflix'), ('com.sony.dtv.youtube',
+                                               'YouTube')]
+
+
+class FakeBraviaDevice(object):
+
+    def __init__(self, host='127.0.0.1', port=0, psk=None, channels=100,
+                 latency=0.0, jitter=0.0, error_rate=0.0, errors=None,
+                 model='KD-55FAKE', generation='5.2.0',
+                 mac='02:00:00:00:00:01'):
+        """Create a fake TV listening on host:port (0 picks a free port).
+
+           Every request is delayed by latency seconds plus up to jitter.
+           error_rate is the probability of answering HTTP 500 and errors
+           maps JSON-RPC method names to the [code, message] error they
+           return. With psk, requests without the matching X-Auth-PSK
+           header are rejected with 403.
+
+           The TV starts active; state, calls and the settings above are
+           plain attributes that can be changed while it runs.
+        """
+        self.psk = psk
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.errors = dict(errors or {})
+        self.model = model
+        self.generation = generation
+        self.mac = mac
+        self.power = 'active'
+        self.volume = 20
+        self.mute = False
+        self.playing_uri = None
+        self.calls = []
+        self.channels = [{'title': 'Channel {}'.format(index),
+                          'uri': 'tv:dvbt?trip=1.{}.{}'.format(index, index),
+                          'dispNum': '{:03d}'.format(index + 1),
+                          'index': index}
+                         for index in range(channels)]
+        self.inputs = [{'title': 'HDMI {}'.format(port),
+                        'uri': 'extInput:hdmi?port={}'.format(port),
+                        'index': port - 1} for port in range(1, 5)]
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.device = self
+        self._thread = None
+
+    @property
+    def host(self):
+        """host:port to pass to BraviaRC."""
+        return '{}:{}'.format(*self._server.server_address[:2])
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='FakeBraviaDevice')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def record(self, kind, name):
+        with self._lock:
+            self.calls.append((time.time(), kind, name))
+
+    def delay(self):
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def rpc(self, service, method, params):
+        """Return the JSON-RPC result of method, or raise KeyError."""
+        # pylint: disable=too-many-return-statements
+        params = params[0] if params else {}
+        if method == 'actRegister':
+            return []
+        if method == 'getPowerStatus':
+            return [{'status': self.power}]
+        if method == 'setPowerStatus':
+            self.power = 'active' if params.get('status') in \
+                (True, 'true') else 'standby'
+            return []
+        if method == 'getSystemInformation':
+            return [{'product': 'TV', 'name': 'BRAVIA', 'model': self.model,
+                     'language': 'eng', 'generation': self.generation,
+                     'macAddr': self.mac}]
+        if method == 'getNetworkSettings':
+            return [[{'netif': 'eth0', 'hwAddr': self.mac,
+                      'ipAddrV4': self._server.server_address[0],
+                      'netmask': '255.255.255.0',
+                      'gateway': '127.0.0.254'}]]
+        if method == 'getRemoteControllerInfo':
+            return [{'bundled': True, 'type': 'RM-J1100'},
+                    [{'name': name, 'value': 'AAAAAQAAAAEAAAA{}Aw=='.format(
+                        index)} for index, name in enumerate(COMMANDS)]]
+        if method == 'getVolumeInformation':
+            return [[{'target': 'speaker', 'volume': self.volume,
+                      'mute': self.mute, 'maxVolume': 100,
+                      'minVolume': 0}]]
+        if method == 'setAudioVolume':
+            volume = params['volume']
+            if volume.startswith(('+', '-')):
+                volume = self.volume + int(volume)
+            self.volume = max(0, min(100, int(volume)))
+            return [0]
+        if method == 'setAudioMute':
+            self.mute = bool(params.get('status'))
+            return [0]
+        if method == 'getPlayingContentInfo':
+            channel = next((item for item in self.channels + self.inputs
+                            if item['uri'] == self.playing_uri),
+                           self.channels[0] if self.channels else {})
+            return [{'title': channel.get('title'),
+                     'uri': channel.get('uri'), 'source': 'tv:dvbt',
+                     'dispNum': channel.get('dispNum'),
+                     'programTitle': 'Programme',
+                     'programMediaType': 'tv',
+                     'startDateTime': time.strftime('%Y-%m-%dT%H:00:00%z'),
+                     'durationSec': 3600}]
+        if method in ('setPlayContent', 'setActiveApp'):
+            self.playing_uri = params.get('uri')
+            return []
+        if method == 'getSourceList':
+            if params.get('scheme') == 'tv':
+                return [[{'source': 'tv:dvbt'}]]
+            return [[{'source': 'extInput:hdmi'}]]
+        if method == 'getContentCount':
+            if params.get('source') == 'tv:dvbt':
+                return [{'count': len(self.channels)}]
+            return [{'count': len(self.inputs)}]
+        if method == 'getContentList':
+            if params.get('source') != 'tv:dvbt':
+                return [self.inputs]
+            start = params.get('stIdx', 0)
+            return [self.channels[start:start + params.get('cnt', 50)]]
+        if method == 'getApplicationList':
+            return [[{'title': title, 'uri': uri, 'icon': ''}
+                     for uri, title in APPS]]
+        if method == 'getLEDIndicatorStatus':
+            return [{'mode': 'Demo', 'status': 'true'}]
+        if method == 'setLEDIndicatorStatus':
+            return []
+        raise KeyError(method)
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # send headers and body in one segment
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+    def _send(self, code, body=b'', content_type='application/json',
+              headers=()):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in headers:
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _check(self):
+        """Apply latency, error injection and PSK checks."""
+        device = self.server.device
+        device.delay()
+        if device.error_rate and random.random() < device.error_rate:
+            self._send(500, b'injected error', 'text/plain')
+            return False
+        if device.psk is not None and \
+           self.path != '/sony/accessControl' and \
+           self.headers.get('X-Auth-PSK') != device.psk:
+            self._send(403, b'forbidden', 'text/plain')
+            return False
+        return True
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        device = self.server.device
+        device.record('DIAL', self.path)
+        if not self._check():
+            return
+        if self.path.rstrip('/') != '/DIAL/sony/applist':
+            self._send(404, b'', 'text/plain')
+            return
+        body = '<service>{}</service>'.format(''.join(
+            '<app><id>{}</id><name>{}</name></app>'.format(uri, title)
+            for uri, title in APPS)).encode('utf-8')
+        self._send(200, body, 'text/xml; charset="utf-8"')
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        device = self.server.device
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not self._check():
+            device.record('ERROR', self.path)
+            return
+
+        if self.path == '/sony/IRCC':
+            device.record('IRCC', body)
+            if b'<IRCCCode>' not in body:
+                self._send(500, b'', 'text/xml')
+            else:
+                self._send(200, b'', 'text/xml')
+            return
+
+        if self.path.startswith('/DIAL/apps/'):
+            device.record('DIAL', self.path)
+            self._send(201, b'', 'text/plain')
+            return
+
+        try:
+            request = json.loads(body.decode('utf-8'))
+            method = request['method']
+        except (ValueError, KeyError):
+            self._send(400, b'', 'text/plain')
+            return
+        device.record('JSON', method)
+
+        headers = []
+        resp = {'id': request.get('id')}
+        if method in device.errors:
+            resp['error'] = device.errors[method]
+        else:
+            try:
+                resp['result'] = device.rpc(self.path, method,
+                                            request.get('params'))
+            except KeyError:
+                resp['error'] = [12, 'No Such Method']
+        if method == 'actRegister' and 'result' in resp:
+            headers.append(('Set-Cookie', 'auth=fakeauth; Path=/sony/; '
+                                          'Max-Age=1209600'))
+        self._send(200, json.dumps(resp).encode('utf-8'),
+                   headers=headers)
@@ -0,0 +1,201 @@
+"""
+Fan-out control of many Sony Bravia TVs.
+"""
+import collections
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .braviarc import (BraviaRC, BraviaRCError, DeadlineExceeded, TIMEOUT,
+                       create_session)
+
+MAX_WORKERS = 32
+
+
+class FleetResult(collections.namedtuple('FleetResult',
+                                         ['host', 'value', 'error',
+                                          'elapsed'])):
+    """Outcome of a call on one TV: either value or error is set.
+
+       error is the exception raised by the call, including HTTP errors, or
+       a BraviaRCError when the TV answered with a JSON-RPC error.
+    """
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class BraviaFleet(object):
+
+    def __init__(self, hosts=(), max_workers=MAX_WORKERS, deadline=TIMEOUT,
+                 deadlines=None, timeouts=None, session=None, hooks=None):
+        """Initialize a fleet of TVs.
+
+           hosts is an iterable of host names, of dicts with the BraviaRC
+           arguments (host, psk, mac) or of BraviaRC instances. The TVs
+           created by the fleet share one connection pool and raise their
+           transport errors so that they can be reported per host.
+
+           deadline is the time in seconds after which a host is reported
+           as DeadlineExceeded, deadlines overrides it per host.
+
+           hooks are passed to every BraviaRC, e.g. a shared
+           metrics.MetricsRegistry.
+        """
+        self._owns_session = session is None
+        if session is None:
+            session = create_session(pool_connections=max_workers,
+                                     pool_maxsize=2)
+        self._session = session
+        self._timeouts = timeouts
+        self._hooks = hooks
+        self._deadline = deadline
+        self._deadlines = dict(deadlines or {})
+        self._tvs = collections.OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        for host in hosts:
+            if isinstance(host, BraviaRC):
+                self._tvs[host._host] = host  # pylint: disable=protected-access
+            elif isinstance(host, dict):
+                self.add(**host)
+            else:
+                self.add(host)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getitem__(self, host):
+        return self._tvs[host]
+
+    def __len__(self):
+        return len(self._tvs)
+
+    @property
+    def hosts(self):
+        return list(self._tvs)
+
+    def add(self, host, psk=None, mac=None, deadline=None):
+        """Add a TV to the fleet and return its BraviaRC instance."""
+        self._tvs[host] = BraviaRC(host, psk=psk, mac=mac,
+                                   session=self._session,
+                                   timeouts=self._timeouts,
+                                   raise_errors=True, hooks=self._hooks)
+        if deadline is not None:
+            self._deadlines[host] = deadline
+        return self._tvs[host]
+
+    def remove(self, host):
+        """Remove a TV from the fleet."""
+        self._deadlines.pop(host, None)
+        self._tvs.pop(host).close()
+
+    def close(self):
+        """Stop the workers and release the connection pool."""
+        self._executor.shutdown(wait=False)
+        for tv in self._tvs.values():
+            tv.close()
+        if self._owns_session:
+            self._session.close()
+
+    def _call_one(self, tv, end, method, args, kwargs):
+        start = time.monotonic()
+        with tv.deadline(end - start):
+            value = getattr(tv, method)(*args, **kwargs)
+        if isinstance(value, dict) and value.get('error'):
+            raise BraviaRCError('{}: {} rejected: {}'.format(
+                tv._host, method,  # pylint: disable=protected-access
+                value['error']))
+        return value, time.monotonic() - start
+
+    def call(self, method, *args, hosts=None, deadline=None, **kwargs):
+        """Call a BraviaRC method on every TV concurrently.
+
+           hosts restricts the call to some TVs and deadline overrides the
+           fleet deadline. Returns an OrderedDict mapping each host to a
+           FleetResult, in fleet order.
+        """
+        if hosts is None:
+            hosts = list(self._tvs)
+        start = time.monotonic()
+        pending = {}
+        for host in hosts:
+            end = start + self._deadlines.get(
+                host, self._deadline if deadline is None else deadline)
+            future = self._executor.submit(self._call_one, self._tvs[host],
+                                           end, method, args, kwargs)
+            pending[future] = (host, end)
+
+        results = {}
+        while pending:
+            now = time.monotonic()
+            for future, (host, end) in list(pending.items()):
+                if future.done():
+                    del pending[future]
+                    try:
+                        value, elapsed = future.result()
+                    except Exception as exception_instance:  # pylint: disable=broad-except
+                        results[host] = FleetResult(host, None,
+                                                    exception_instance,
+                                                    now - start)
+                    else:
+                        results[host] = FleetResult(host, value, None,
+                                                    elapsed)
+                elif end <= now:
+                    del pending[future]
+                    future.cancel()
+                    error = DeadlineExceeded('{}: no answer to {} after '
+                                             '{:.1f}s'.format(host, method,
+                                                              now - start))
+                    results[host] = FleetResult(host, None, error,
+                                                now - start)
+            if pending:
+                wait(pending, return_when=FIRST_COMPLETED,
+                     timeout=min(end for _, end in pending.values()) - now)
+
+        return collections.OrderedDict((host, results[host])
+                                       for host in hosts)
+
+    def get_power_status(self, **kwargs):
+        """Get the power status of every TV."""
+        return self.call('get_power_status', **kwargs)
+
+    def get_playing_info(self, **kwargs):
+        """Get the playing content of every TV."""
+        return self.call('get_playing_info', **kwargs)
+
+    def get_volume_info(self, **kwargs):
+        """Get the volume of every TV."""
+        return self.call('get_volume_info', **kwargs)
+
+    def turn_on(self, **kwargs):
+        """Turn every TV on."""
+        return self.call('turn_on', **kwargs)
+
+    def turn_off(self, **kwargs):
+        """Turn every TV off."""
+        return self.call('turn_off', **kwargs)
+
+    def send_command(self, command, **kwargs):
+        """Send a remote controller command to every TV."""
+        return self.call('send_command', command, **kwargs)
+
+    def set_volume_level(self, volume, **kwargs):
+        """Set the volume level of every TV, range 0..1."""
+        return self.call('set_volume_level', volume, **kwargs)
+
+    def select_source(self, source, **kwargs):
+        """Set the input source of every TV."""
+        return self.call('select_source', source, **kwargs)
+
+    def play_content(self, uri, **kwargs):
+        """Play content by URI on every TV."""
+        return self.call('play_content', uri, **kwargs)
+
+    def start_app(self, app_name, **kwargs):
+        """Start an app by name on every TV."""
+        return self.call('start_app', app_name, **kwargs)
@@ -0,0 +1,134 @@
+"""
+Request instrumentation for BraviaRC.
+
+Every HTTP request sent by a BraviaRC is described by a RequestEvent passed
+to the hooks of the instance. MetricsRegistry is such a hook aggregating
+events into counters and latency histograms:
+
+    registry = MetricsRegistry()
+    tv = BraviaRC('192.168.1.25', hooks=[registry])
+    ...
+    print(registry.render_text())
+"""
+import bisect
+import collections
+import threading
+
+# seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+RequestEvent = collections.namedtuple('RequestEvent', [
+    'host',            # host of the TV
+    'endpoint',        # e.g. 'sony/system', 'sony/IRCC', 'DIAL/apps'
+    'method',          # JSON-RPC method, 'X_SendIRCC' or DIAL action
+    'status',          # HTTP status, None if no response was received
+    'elapsed',         # seconds until the body was received
+    'response_time',   # seconds until the response headers were received
+    'request_bytes',
+    'response_bytes',
+    'error',           # exception class name, 'HTTPError' or JSON-RPC code
+    'retries',         # attempts made before this one
+])
+
+
+class Histogram(object):
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def snapshot(self):
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return {'buckets': buckets, 'sum': self.total, 'count': self.count}
+
+
+class MetricsRegistry(object):
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """In-memory counters and histograms labelled by host, endpoint and
+           method. Register the instance itself as a BraviaRC hook; it can
+           be shared by many instances and threads."""
+        self._buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = collections.defaultdict(int)
+        self._histograms = {}
+
+    def __call__(self, event):
+        self.record(event)
+
+    def _observe(self, name, labels, value):
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram(self._buckets)
+        histogram.observe(value)
+
+    def record(self, event):
+        """Aggregate a RequestEvent."""
+        labels = (('host', event.host), ('endpoint', event.endpoint),
+                  ('method', event.method))
+        with self._lock:
+            self._counters[('bravia_requests_total', labels)] += 1
+            self._counters[('bravia_request_bytes_total', labels)] += \
+                event.request_bytes
+            self._counters[('bravia_response_bytes_total', labels)] += \
+                event.response_bytes
+            if event.retries:
+                self._counters[('bravia_retries_total', labels)] += \
+                    event.retries
+            if event.error is not None:
+                self._counters[('bravia_errors_total',
+                                labels + (('error', event.error),))] += 1
+            self._observe('bravia_request_seconds', labels, event.elapsed)
+            if event.response_time is not None:
+                self._observe('bravia_response_seconds', labels,
+                              event.response_time)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self):
+        """Return {'counters': {(name, labels): value},
+                   'histograms': {(name, labels): {...}}}."""
+        with self._lock:
+            return {'counters': dict(self._counters),
+                    'histograms': dict(
+                        (key, histogram.snapshot())
+                        for key, histogram in self._histograms.items())}
+
+    def render_text(self):
+        """Render the metrics in the Prometheus text exposition format."""
+        def format_labels(labels):
+            return '{' + ','.join('{}="{}"'.format(
+                key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                for key, value in labels) + '}'
+
+        snapshot = self.snapshot()
+        lines = []
+        for (name, labels), value in sorted(snapshot['counters'].items()):
+            lines.append('{}{} {}'.format(name, format_labels(labels), value))
+        for (name, labels), histogram in sorted(
+                snapshot['histograms'].items()):
+            for bound, count in histogram['buckets']:
+                bucket_labels = labels + (('le', '+Inf' if bound == float(
+                    'inf') else repr(bound)),)
+                lines.append('{}_bucket{} {}'.format(
+                    name, format_labels(bucket_labels), count))
+            lines.append('{}_sum{} {}'.format(name, format_labels(labels),
+                                              histogram['sum']))
+            lines.append('{}_count{} {}'.format(name, format_labels(labels),
+                                                histogram['count']))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,180 @@
+"""
+Typed, read-only views of the Sony Bravia API responses.
+
+The models are also read-only mappings with the keys of the dicts returned
+by earlier versions, so ``info.title`` and ``info.get('title')`` are
+equivalent. PlayingInfo, SystemInfo, NetworkInfo and VolumeInfo keep the
+decoded JSON-RPC result they wrap and only look a field up when it is
+read; ContentItem and AppInfo copy the few fields they need so that cached
+content lists do not keep the full API objects alive.
+"""
+import collections.abc
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(content):
+    """Decode a JSON document, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(content)
+    if isinstance(content, bytes):
+        content = content.decode('utf-8')
+    return json.loads(content)
+
+
+def _field(key):
+    return property(lambda self: self._data.get(key))
+
+
+class _Model(collections.abc.Mapping):
+    """Read-only mapping of _keys, each read from an attribute."""
+
+    __slots__ = ()
+    # mapping key: attribute name
+    _keys = {}
+
+    def __setattr__(self, name, value):
+        raise AttributeError('{} is read-only'.format(type(self).__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError('{} is read-only'.format(type(self).__name__))
+
+    def _present(self):
+        return True
+
+    def __getitem__(self, key):
+        attribute = self._keys.get(key)
+        if attribute is None or not self._present():
+            raise KeyError(key)
+        return getattr(self, attribute)
+
+    def __iter__(self):
+        return iter(self._keys if self._present() else ())
+
+    def __len__(self):
+        return len(self._keys) if self._present() else 0
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, dict(self))
+
+
+class _LazyModel(_Model):
+    """Model reading its fields from a decoded JSON object on access."""
+
+    __slots__ = ('_data',)
+
+    def __init__(self, data=None):
+        object.__setattr__(self, '_data', data or {})
+
+    def __reduce__(self):
+        return type(self), (self._data,)
+
+    def _present(self):
+        return bool(self._data)
+
+
+class PlayingInfo(_LazyModel):
+    """Content shown on the TV, from getPlayingContentInfo."""
+
+    __slots__ = ()
+    _keys = {'programTitle': 'program_title', 'title': 'title',
+             'programMediaType': 'program_media_type', 'dispNum': 'disp_num',
+             'source': 'source', 'uri': 'uri', 'durationSec': 'duration_sec',
+             'startDateTime': 'start_date_time'}
+
+    program_title = _field('programTitle')
+    title = _field('title')
+    program_media_type = _field('programMediaType')
+    disp_num = _field('dispNum')
+    source = _field('source')
+    uri = _field('uri')
+    duration_sec = _field('durationSec')
+    start_date_time = _field('startDateTime')
+
+
+class SystemInfo(_LazyModel):
+    """Model and firmware of the TV, from getSystemInformation."""
+
+    __slots__ = ()
+    _keys = {'name': 'name', 'model': 'model', 'language': 'language',
+             'generation': 'generation', 'macAddr': 'mac_addr'}
+
+    name = _field('name')
+    model = _field('model')
+    language = _field('language')
+    generation = _field('generation')
+    mac_addr = _field('macAddr')
+
+
+class NetworkInfo(_LazyModel):
+    """First network interface of the TV, from getNetworkSettings."""
+
+    __slots__ = ()
+    _keys = {'mac': 'mac', 'ip': 'ip', 'gateway': 'gateway',
+             'netmask': 'netmask'}
+
+    mac = _field('hwAddr')
+    ip = _field('ipAddrV4')
+    gateway = _field('gateway')
+    netmask = _field('netmask')
+
+
+class VolumeInfo(_LazyModel):
+    """Volume of an output, from getVolumeInformation."""
+
+    __slots__ = ()
+    _keys = {'target': 'target', 'volume': 'volume', 'mute': 'mute',
+             'maxVolume': 'max_volume', 'minVolume': 'min_volume'}
+
+    target = _field('target')
+    volume = _field('volume')
+    mute = _field('mute')
+    max_volume = _field('maxVolume')
+    min_volume = _field('minVolume')
+
+
+class ContentItem(_Model):
+    """Channel or input, from getContentList."""
+
+    __slots__ = ('title', 'uri', 'index', 'disp_num')
+    _keys = {'title': 'title', 'uri': 'uri', 'index': 'index',
+             'dispNum': 'disp_num'}
+
+    def __init__(self, title, uri, index=None, disp_num=None):
+        object.__setattr__(self, 'title', title)
+        object.__setattr__(self, 'uri', uri)
+        object.__setattr__(self, 'index', index)
+        object.__setattr__(self, 'disp_num', disp_num)
+
+    def __reduce__(self):
+        return type(self), (self.title, self.uri, self.index, self.disp_num)
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data.get('title'), data.get('uri'), data.get('index'),
+                   data.get('dispNum'))
+
+
+class AppInfo(_Model):
+    """Installed app, from getApplicationList and the DIAL app list."""
+
+    __slots__ = ('title', 'uri', 'icon', 'dial_id')
+    _keys = {'title': 'title', 'uri': 'uri', 'icon': 'icon',
+             'dialId': 'dial_id'}
+
+    def __init__(self, title, uri, icon=None, dial_id=None):
+        object.__setattr__(self, 'title', title)
+        object.__setattr__(self, 'uri', uri)
+        object.__setattr__(self, 'icon', icon)
+        object.__setattr__(self, 'dial_id', dial_id)
+
+    def __reduce__(self):
+        return type(self), (self.title, self.uri, self.icon, self.dial_id)
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data.get('title'), data.get('uri'), data.get('icon'))
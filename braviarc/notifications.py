@@ -0,0 +1,205 @@
+"""
+Push notifications of Sony Bravia state changes.
+
+Built on AsyncBraviaRC (requires aiohttp).
+"""
+import asyncio
+import collections
+import json
+import logging
+import random
+
+import aiohttp
+
+from .models import VolumeInfo, loads
+
+_LOGGER = logging.getLogger(__name__)
+
+POLL_INTERVAL = 10
+RECONNECT_MIN_DELAY = 1
+RECONNECT_MAX_DELAY = 60
+
+# event type: (service, notification, getter used when polling)
+NOTIFICATIONS = collections.OrderedDict([
+    ('power', ('sony/system', 'notifyPowerStatus', 'get_power_status')),
+    ('content', ('sony/avContent', 'notifyPlayingContentInfo',
+                 'get_playing_info')),
+    ('volume', ('sony/audio', 'notifyVolumeInformation', 'get_volume_info')),
+])
+
+BraviaEvent = collections.namedtuple('BraviaEvent',
+                                     ['host', 'type', 'data', 'polled'])
+
+
+class NotificationsUnsupported(Exception):
+    """The TV does not offer the notification."""
+
+
+class BraviaNotifier(object):
+
+    def __init__(self, tv, events=tuple(NOTIFICATIONS),
+                 poll_interval=POLL_INTERVAL):
+        """Watch the state of an AsyncBraviaRC.
+
+           events is a subset of 'power', 'content' and 'volume'. Each one
+           is received through the switchNotifications WebSocket of its
+           service, reconnecting with backoff when the connection drops, or
+           polled every poll_interval seconds on models lacking it.
+
+           Events are delivered as BraviaEvent to the callbacks registered
+           with subscribe() and to every `async for event in notifier` loop.
+        """
+        self._tv = tv
+        self._events = list(events)
+        self._poll_interval = poll_interval
+        self._callbacks = []
+        self._queues = []
+        self._tasks = []
+        self._last = {}
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        queue = asyncio.Queue()
+        self._queues.append(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._queues.remove(queue)
+
+    def subscribe(self, callback):
+        """Call callback(event) on every event, it may be a coroutine
+           function. Returns a function removing the subscription."""
+        self._callbacks.append(callback)
+        return lambda: self._callbacks.remove(callback)
+
+    def start(self):
+        """Start watching, from a running event loop."""
+        if not self._tasks:
+            self._tasks = [asyncio.ensure_future(self._watch(event_type))
+                           for event_type in self._events]
+
+    async def stop(self):
+        """Stop watching."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _emit(self, event_type, data, polled):
+        if polled and self._last.get(event_type) == data:
+            return
+        self._last[event_type] = data
+        event = BraviaEvent(self._tv._host,  # pylint: disable=protected-access
+                            event_type, data, polled)
+        for queue in self._queues:
+            queue.put_nowait(event)
+        for callback in list(self._callbacks):
+            try:
+                result = callback(event)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Error in notification callback")
+
+    def _parse(self, event_type, params):
+        """Give a notification the shape returned by the getter."""
+        # pylint: disable=protected-access
+        if event_type == 'power':
+            return self._tv._parse_power_status({'result': [params]})
+        if event_type == 'content':
+            return self._tv._parse_playing_info({'result': [params]})
+        if event_type == 'volume':
+            return VolumeInfo(params)
+        return params
+
+    async def _poll(self, event_type):
+        getter = NOTIFICATIONS[event_type][2]
+        await self._emit(event_type, await getattr(self._tv, getter)(), True)
+
+    async def _watch(self, event_type):
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            try:
+                await self._listen(event_type)
+                # the connection worked, start over with a short delay
+                delay = RECONNECT_MIN_DELAY
+                reason = "connection closed"
+            except asyncio.CancelledError:
+                raise
+            except NotificationsUnsupported as exception_instance:
+                _LOGGER.info("%s, polling every %ss", exception_instance,
+                             self._poll_interval)
+                break
+            except Exception as exception_instance:  # pylint: disable=broad-except
+                reason = exception_instance
+            _LOGGER.warning("Notifications of %s lost: %s, reconnecting in "
+                            "%ss", event_type, reason, delay)
+            await asyncio.sleep(delay * (0.5 + random.random()))
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+        while True:
+            await self._poll(event_type)
+            await asyncio.sleep(self._poll_interval)
+
+    async def _switch(self, websocket, params):
+        await websocket.send_str(json.dumps(
+            {"method": "switchNotifications", "params": [params],
+             "id": 1, "version": "1.0"}))
+        while True:
+            message = await websocket.receive()
+            if message.type != aiohttp.WSMsgType.TEXT:
+                raise ConnectionError("WebSocket closed")
+            resp = loads(message.data)
+            if resp.get('id') == 1:
+                if resp.get('error'):
+                    raise NotificationsUnsupported(
+                        "switchNotifications error: {}".format(
+                            resp.get('error')))
+                return resp.get('result')[0]
+
+    async def _listen(self, event_type):
+        service, notification, _ = NOTIFICATIONS[event_type]
+        try:
+            websocket = await self._tv.ws_connect(service)
+        except aiohttp.WSServerHandshakeError as exception_instance:
+            raise NotificationsUnsupported(
+                "No notifications WebSocket on {}: {}".format(
+                    service, exception_instance))
+
+        async with websocket:
+            available = await self._switch(websocket, {})
+            names = [item for item in available.get('enabled', []) +
+                     available.get('disabled', [])
+                     if item.get('name') == notification]
+            if not names:
+                raise NotificationsUnsupported(
+                    "{} not offered by {}".format(notification, service))
+            enabled = [item for item in available.get('enabled', [])
+                       if item.get('name') != notification] + names[:1]
+            await self._switch(websocket, {"enabled": enabled,
+                                           "disabled": []})
+
+            # catch up on what changed while disconnected
+            await self._poll(event_type)
+
+            async for message in websocket:
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    break
+                data = loads(message.data)
+                if data.get('method') == notification:
+                    params = (data.get('params') or [{}])[0]
+                    if event_type == 'volume' and \
+                       params.get('target') != 'speaker':
+                        continue
+                    await self._emit(event_type,
+                                     self._parse(event_type, params), False)
@@ -0,0 +1,102 @@
+"""
+Timeout, retry and circuit breaker policies of BraviaRC.
+"""
+import collections
+import threading
+import time
+
+CONNECT_TIMEOUT = 3
+READ_TIMEOUT = 10
+FAILURE_THRESHOLD = 3
+RESET_TIMEOUT = 30
+
+RequestPolicy = collections.namedtuple('RequestPolicy', [
+    'connect_timeout',  # seconds to open the connection
+    'read_timeout',     # seconds to wait for the response
+    'retries',          # extra attempts, only for idempotent calls
+    'backoff',          # seconds before the first retry, doubled each time
+])
+
+DEFAULT_POLICY = RequestPolicy(CONNECT_TIMEOUT, READ_TIMEOUT, 1, 0.2)
+
+# keyed by JSON-RPC method or BraviaRC request label
+DEFAULT_POLICIES = {
+    'getPowerStatus': RequestPolicy(2, 3, 1, 0.2),
+    'getVolumeInformation': RequestPolicy(2, 5, 1, 0.2),
+    'getPlayingContentInfo': RequestPolicy(2, 5, 1, 0.2),
+    'getContentList': RequestPolicy(CONNECT_TIMEOUT, 30, 2, 0.5),
+    'getContentCount': RequestPolicy(CONNECT_TIMEOUT, 15, 2, 0.5),
+    'X_SendIRCC': RequestPolicy(2, 5, 0, 0),
+    'actRegister': RequestPolicy(CONNECT_TIMEOUT, 30, 0, 0),
+}
+
+# overall deadline in seconds of BraviaRC high-level calls
+DEFAULT_DEADLINES = {
+    'get_state': 15,
+    'turn_on': 20,
+    'turn_on_command': 20,
+    'load_source_list': 120,
+    'select_source': 120,
+    'start_app': 30,
+}
+
+
+def is_idempotent(label):
+    """Whether a request can be replayed safely."""
+    return label is not None and label.startswith('get')
+
+
+class CircuitBreaker(object):
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD,
+                 reset_timeout=RESET_TIMEOUT):
+        """Fail fast while a host is known to be down.
+
+           After failure_threshold consecutive transport failures the
+           circuit opens and requests are refused for reset_timeout
+           seconds. Then one trial request is let through: its success
+           closes the circuit, its failure opens it again.
+        """
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self):
+        """Return whether a request may be sent now."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial or \
+               time.monotonic() - self._opened_at < self._reset_timeout:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self._failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+    def release(self):
+        """Give back the trial request of allow() when it was not sent."""
+        with self._lock:
+            self._trial = False
+
+    def reset(self):
+        """Close the circuit, e.g. after waking the TV up."""
+        self.record_success()
@@ -0,0 +1,229 @@
+"""
+Scheduled background polling of many Sony Bravia TVs.
+"""
+import collections
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .braviarc import BraviaRC, BraviaState, POWER_UNREACHABLE
+from .models import PlayingInfo
+
+_LOGGER = logging.getLogger(__name__)
+
+POLL_INTERVAL = 10
+STANDBY_INTERVAL = 30
+FAST_INTERVAL = 1
+FAST_PERIOD = 10
+MAX_BACKOFF = 300
+MAX_WORKERS = 8
+
+PolledState = collections.namedtuple('PolledState',
+                                     ['host', 'state', 'updated',
+                                      'failures'])
+
+
+class BraviaPoller(object):
+
+    def __init__(self, tvs=(), interval=POLL_INTERVAL,
+                 standby_interval=STANDBY_INTERVAL,
+                 fast_interval=FAST_INTERVAL, fast_period=FAST_PERIOD,
+                 max_backoff=MAX_BACKOFF, max_workers=MAX_WORKERS,
+                 callback=None):
+        """Poll the state of BraviaRC instances in the background.
+
+           Active TVs are polled every interval seconds and TVs in standby
+           every standby_interval. After poke() or command() a TV is polled
+           every fast_interval for fast_period seconds, and never more often
+           however many times it is poked. A TV that does not answer is
+           reported POWER_UNREACHABLE and polled again after an exponential
+           backoff with jitter, up to max_backoff seconds.
+
+           callback(polled_state) is called from a worker after each poll.
+        """
+        self._interval = interval
+        self._standby_interval = standby_interval
+        self._fast_interval = fast_interval
+        self._fast_period = fast_period
+        self._max_backoff = max_backoff
+        self._callback = callback
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._condition = threading.Condition()
+        self._counter = itertools.count()
+        # heap of (due time, counter, host), entries not matching _due are
+        # stale and skipped
+        self._schedule = []
+        # host: due time of its single scheduled poll
+        self._due = {}
+        # host: start time of its last poll
+        self._last_poll = {}
+        self._tvs = {}
+        self._states = {}
+        self._failures = {}
+        self._fast_until = {}
+        self._in_flight = set()
+        self._repoll = set()
+        self._thread = None
+        self._running = False
+        for tv in tvs:
+            self.add(tv)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def add(self, tv):
+        """Start polling a BraviaRC, it is polled right away."""
+        host = tv._host  # pylint: disable=protected-access
+        with self._condition:
+            self._tvs[host] = tv
+            self._failures[host] = 0
+            self._schedule_locked(host, time.monotonic())
+
+    def remove(self, host):
+        """Stop polling a TV."""
+        with self._condition:
+            self._tvs.pop(host, None)
+            self._states.pop(host, None)
+            self._due.pop(host, None)
+
+    def start(self):
+        """Start the scheduler thread."""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run,
+                                        name='BraviaPoller')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop polling and wait for the scheduler thread."""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._executor.shutdown(wait=False)
+
+    def get_state(self, host):
+        """Return the latest PolledState of a TV without blocking, or None
+           if it was not polled yet."""
+        return self._states.get(host)
+
+    def states(self):
+        """Return the latest PolledState of every polled TV."""
+        return dict(self._states)
+
+    def poke(self, host):
+        """Poll a TV now and then often for a while, e.g. after a command.
+
+           The scheduled poll is only moved forward, to fast_interval after
+           the previous one at the earliest.
+        """
+        with self._condition:
+            self._fast_until[host] = time.monotonic() + self._fast_period
+            if host in self._in_flight:
+                self._repoll.add(host)
+                return
+            due = self._due.get(host)
+            when = self._fast_due(host)
+            if due is None or when < due:
+                self._schedule_locked(host, when)
+
+    def command(self, host, method, *args, **kwargs):
+        """Call a BraviaRC method on a TV and poke it."""
+        try:
+            return getattr(self._tvs[host], method)(*args, **kwargs)
+        finally:
+            self.poke(host)
+
+    def _fast_due(self, host):
+        return max(time.monotonic(),
+                   self._last_poll.get(host, float('-inf')) +
+                   self._fast_interval)
+
+    def _schedule_locked(self, host, when):
+        """Replace the scheduled poll of host by one at monotonic time when.
+        """
+        self._due[host] = when
+        heapq.heappush(self._schedule, (when, next(self._counter), host))
+        self._condition.notify()
+
+    def _run(self):
+        with self._condition:
+            while self._running:
+                now = time.monotonic()
+                while self._schedule and self._schedule[0][0] <= now:
+                    when, _, host = heapq.heappop(self._schedule)
+                    if self._due.get(host) != when or host not in self._tvs:
+                        continue
+                    del self._due[host]
+                    if host in self._in_flight:
+                        # rescheduled when the poll completes
+                        continue
+                    self._last_poll[host] = now
+                    self._in_flight.add(host)
+                    self._executor.submit(self._poll, host)
+                timeout = None
+                if self._schedule:
+                    timeout = self._schedule[0][0] - now
+                self._condition.wait(timeout)
+
+    def _next_delay(self, host, power):
+        if power == POWER_UNREACHABLE:
+            backoff = min(self._interval * 2 ** self._failures[host],
+                          self._max_backoff)
+            return random.uniform(backoff / 2, backoff)
+        if time.monotonic() < self._fast_until.get(host, 0):
+            return self._fast_interval
+        if power == 'active':
+            return self._interval
+        return self._standby_interval
+
+    def _poll(self, host):
+        tv = self._tvs.get(host)
+        try:
+            state = tv.get_state()
+        except Exception as exception_instance:  # pylint: disable=broad-except
+            _LOGGER.debug("Polling %s failed: %s", host, exception_instance)
+            state = BraviaState(POWER_UNREACHABLE, PlayingInfo(), None)
+
+        with self._condition:
+            self._in_flight.discard(host)
+            if host not in self._tvs:
+                return
+            if state.power == POWER_UNREACHABLE:
+                self._failures[host] += 1
+            else:
+                self._failures[host] = 0
+            polled = PolledState(host, state, time.time(),
+                                 self._failures[host])
+            self._states[host] = polled
+            if host in self._repoll:
+                self._repoll.discard(host)
+                when = self._fast_due(host)
+            else:
+                when = time.monotonic() + self._next_delay(host, state.power)
+            self._schedule_locked(host, when)
+
+        if self._callback is not None:
+            try:
+                self._callback(polled)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Error in poller callback")
+
+    @classmethod
+    def from_hosts(cls, hosts, **kwargs):
+        """Create a poller for host names or dicts of BraviaRC arguments."""
+        return cls([BraviaRC(**host) if isinstance(host, dict)
+                    else BraviaRC(host) for host in hosts], **kwargs)
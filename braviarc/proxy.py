@@ -0,0 +1,352 @@
+"""
+Local proxy sharing one connection pool and state cache per TV between
+processes.
+
+    with BraviaProxy({'living': {'host': '192.168.1.25', 'psk': '0000'}},
+                     address=('127.0.0.1', 8080)) as proxy:
+        proxy.serve_forever()
+
+Clients use BraviaRC unchanged by pointing it at the proxy:
+
+    tv = BraviaRC('127.0.0.1:8080/tv/living')
+
+or, when it listens on a Unix socket, through an HTTPClientTransport:
+
+    tv = BraviaRC('localhost/tv/living', transport=HTTPClientTransport(
+        unix_socket='/run/braviarc.sock'))
+
+The proxy registers with the TVs and answers the registration of its
+clients itself, so it only listens on loopback addresses unless
+allow_remote is set.
+
+The proxy forwards the JSON-RPC services, IRCC and DIAL under
+``/tv/<name>/``, where identical concurrent reads share one request to the
+TV and getter responses are served from its response cache. It also serves
+``GET /tvs`` and the polled ``GET /tv/<name>/state``.
+"""
+import ipaddress
+import json
+import logging
+import os
+import re
+import socketserver
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+except ImportError:  # Python < 3.7
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+from .braviarc import (BraviaRC, BraviaRCError, CircuitOpenError,
+                       DeadlineExceeded, WOL_BURST, create_session)
+from .policy import is_idempotent
+from .poller import BraviaPoller
+
+_LOGGER = logging.getLogger(__name__)
+
+PORT = 8080
+POLL_INTERVAL = 5
+MAX_WORKERS = 8
+
+_IRCC_CODE_RE = re.compile(br'<IRCCCode>\s*([^<\s]*)\s*</IRCCCode>')
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn,
+                      socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class BraviaProxy(object):
+
+    def __init__(self, tvs=(), address=('127.0.0.1', PORT), unix_socket=None,
+                 poll_interval=POLL_INTERVAL, max_workers=MAX_WORKERS,
+                 session_store=None, allow_remote=False):
+        """Serve the TVs of tvs on address, or on the unix_socket path.
+
+           tvs maps names to hosts, to dicts with the BraviaRC arguments
+           (host, psk, mac) or to BraviaRC instances. The TVs created by
+           the proxy share one connection pool and session_store, and all
+           of them are polled every poll_interval seconds for /state.
+           Commands forwarded to a TV bring its next poll forward, without
+           polling it more often than every poll_interval.
+
+           Anyone reaching the proxy controls the TVs with its credentials:
+           an address that is not a loopback one raises ValueError, unless
+           allow_remote is set.
+        """
+        if unix_socket is None and not _is_loopback(address[0]):
+            if not allow_remote:
+                raise ValueError(
+                    'Refusing to serve the TVs on {}, which is not a '
+                    'loopback address'.format(address[0] or '*'))
+            _LOGGER.warning("Serving the TVs on %s: any host reaching it "
+                            "controls them without a PSK or PIN",
+                            address[0] or '*')
+        self._session = create_session(pool_connections=max(1, len(tvs)),
+                                       pool_maxsize=max_workers)
+        self._session_store = session_store
+        self._tvs = {}
+        self._poller = BraviaPoller(interval=poll_interval,
+                                    standby_interval=poll_interval,
+                                    fast_interval=poll_interval,
+                                    max_workers=max_workers)
+        for name, tv in dict(tvs).items():
+            self.add(name, tv)
+        if unix_socket is not None:
+            if os.path.exists(unix_socket):
+                os.remove(unix_socket)
+            self._server = _UnixHTTPServer(unix_socket, _UnixProxyHandler)
+        else:
+            self._server = ThreadingHTTPServer(address, _ProxyHandler)
+            self._server.daemon_threads = True
+        self._server.proxy = self
+        self._unix_socket = unix_socket
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def address(self):
+        """host:port of the proxy, or the path of its Unix socket."""
+        if self._unix_socket is not None:
+            return self._unix_socket
+        return '{}:{}'.format(*self._server.server_address[:2])
+
+    def url(self, name):
+        """The host to pass to BraviaRC to reach a TV through the proxy.
+
+           With a Unix socket, BraviaRC also needs an HTTPClientTransport
+           connecting to it.
+        """
+        if self._unix_socket is not None:
+            return 'localhost/tv/{}'.format(name)
+        return '{}/tv/{}'.format(self.address, name)
+
+    def add(self, name, tv):
+        """Serve a TV as name and return its BraviaRC instance."""
+        if not isinstance(tv, BraviaRC):
+            if not isinstance(tv, dict):
+                tv = {'host': tv}
+            tv = BraviaRC(session=self._session, raise_errors=True,
+                          session_store=self._session_store, **tv)
+        self._tvs[name] = tv
+        self._poller.add(tv)
+        return tv
+
+    def get(self, name):
+        """The BraviaRC served as name, or None."""
+        return self._tvs.get(name)
+
+    def names(self):
+        return dict((name, tv._host)  # pylint: disable=protected-access
+                    for name, tv in self._tvs.items())
+
+    def get_state(self, name):
+        """The latest polled state of a TV, polled now if it never was."""
+        tv = self._tvs[name]
+        polled = self._poller.get_state(tv._host)  # pylint: disable=protected-access
+        if polled is not None:
+            return polled.state, polled.updated, polled.failures
+        return tv.get_state(), None, 0
+
+    def poke(self, name):
+        self._poller.poke(self._tvs[name]._host)  # pylint: disable=protected-access
+
+    def start(self):
+        """Poll the TVs and serve requests from a background thread."""
+        self._poller.start()
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='BraviaProxy')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def serve_forever(self):
+        """Block until stop() is called from another thread."""
+        if self._thread is None:
+            self.start()
+        self._thread.join()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._poller.stop()
+        for tv in self._tvs.values():
+            tv.close()
+        self._session.close()
+        if self._unix_socket is not None and \
+           os.path.exists(self._unix_socket):
+            os.remove(self._unix_socket)
+
+
+def _is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _relay(tv, method, path, label, body):
+    """Send a request to the TV, return (status, body, content type)."""
+    endpoint = 'DIAL/apps' if path.startswith('DIAL/apps/') else path
+    response = tv._request(  # pylint: disable=protected-access
+        method, path, endpoint=endpoint, label=label, data=body,
+        cookies=tv._auth_cookie(),  # pylint: disable=protected-access
+        headers=tv._headers)  # pylint: disable=protected-access
+    return (response.status_code, response.content,
+            response.headers.get('Content-Type', 'text/plain'))
+
+
+def _to_json(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if hasattr(value, 'keys'):
+        return dict((key, _to_json(value[key])) for key in value.keys())
+    return [_to_json(item) for item in value]
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+    def _send(self, code, body=b'', content_type='application/json'):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, code, value):
+        self._send(code, json.dumps(value).encode('utf-8'))
+
+    def _send_error(self, exception_instance, request_id=None):
+        if isinstance(exception_instance, DeadlineExceeded):
+            code = 504
+        elif isinstance(exception_instance, CircuitOpenError):
+            code = 503
+        else:
+            code = 502
+        self._send_json(code, {'error': [code, str(exception_instance)],
+                               'id': request_id})
+
+    def _route(self):
+        """Return (name, BraviaRC, path on the TV) or None after a 404."""
+        parts = self.path.split('?', 1)[0].split('/', 3)
+        tv = None
+        if len(parts) >= 3 and parts[1] == 'tv':
+            tv = self.server.proxy.get(parts[2])
+        if tv is None:
+            self._send(404, b'', 'text/plain')
+            return None
+        return parts[2], tv, parts[3] if len(parts) > 3 else ''
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        proxy = self.server.proxy
+        if self.path.split('?', 1)[0].rstrip('/') == '/tvs':
+            self._send_json(200, proxy.names())
+            return
+        route = self._route()
+        if route is None:
+            return
+        name, tv, path = route
+        try:
+            if path == 'state':
+                state, updated, failures = proxy.get_state(name)
+                self._send_json(200, {
+                    'power': state.power, 'playing': _to_json(state.playing),
+                    'volume': _to_json(state.volume), 'updated': updated,
+                    'failures': failures})
+            elif path.startswith('DIAL/'):
+                self._forward(tv, 'GET', path, 'getAppList')
+            else:
+                self._send(404, b'', 'text/plain')
+        except BraviaRCError as exception_instance:
+            self._send_error(exception_instance)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        route = self._route()
+        if route is None:
+            return
+        name, tv, path = route
+        request_id = None
+        try:
+            if path == 'sony/IRCC':
+                match = _IRCC_CODE_RE.search(body)
+                if match is None:
+                    self._send(400, b'', 'text/xml')
+                    return
+                content = tv.send_req_ircc(match.group(1).decode('ascii'))
+                self.server.proxy.poke(name)
+                self._send(200, content or b'', 'text/xml')
+            elif path.startswith('sony/'):
+                try:
+                    request = json.loads(body.decode('utf-8'))
+                    method = request['method']
+                    request_id = request.get('id')
+                except (ValueError, KeyError, AttributeError):
+                    self._send(400, b'', 'text/plain')
+                    return
+                if path == 'sony/accessControl':
+                    # the proxy holds the registration of the TV
+                    self._send_json(200, {'result': [], 'id': request_id})
+                    return
+                self._forward_json(name, tv, path, method, request)
+            elif path.startswith('DIAL/apps/'):
+                self._forward(tv, 'POST', path, 'startApp', body)
+                self.server.proxy.poke(name)
+            else:
+                self._send(404, b'', 'text/plain')
+        except BraviaRCError as exception_instance:
+            self._send_error(exception_instance, request_id)
+
+    def _forward_json(self, name, tv, path, method, request):
+        # canonical parameters, so that identical calls share a request
+        params = json.dumps({"method": method,
+                             "params": request.get('params') or [],
+                             "id": 1,
+                             "version": request.get('version', '1.0')})
+        if method == 'setPowerStatus' and \
+           (request.get('params') or [{}])[0].get('status') in (True, 'true'):
+            try:
+                tv._wakeonlan(WOL_BURST)  # pylint: disable=protected-access
+            except OSError as exception_instance:
+                _LOGGER.debug("Wake-on-LAN failed: %s", exception_instance)
+        resp = tv.bravia_req_json(path, params, False)
+        if not is_idempotent(method):
+            self.server.proxy.poke(name)
+        resp = dict(resp or {})
+        resp['id'] = request.get('id')
+        self._send_json(200, resp)
+
+    def _forward(self, tv, method, path, label, body=None):
+        """Relay a DIAL request, concurrent GETs share one request."""
+        if method == 'GET':
+            result = tv._flight.do(  # pylint: disable=protected-access
+                ('proxy', path), _relay, tv, method, path, label, body)
+        else:
+            result = _relay(tv, method, path, label, body)
+        self._send(*result)
+
+
+class _UnixProxyHandler(_ProxyHandler):
+
+    # TCP_NODELAY does not apply to Unix sockets
+    disable_nagle_algorithm = False
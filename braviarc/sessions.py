@@ -0,0 +1,55 @@
+"""
+On-disk store of the authentication sessions of the TVs.
+"""
+import os
+import threading
+import time
+
+from .cache import read_json_file, write_json_file
+
+DEFAULT_SESSION_PATH = os.path.join(os.path.expanduser('~'), '.cache',
+                                    'braviarc', 'sessions.json')
+
+
+class SessionStore(object):
+
+    def __init__(self, path=DEFAULT_SESSION_PATH):
+        """Auth cookies and registration of each host persisted as JSON.
+
+           A session is a dict with the cookies, clientid and nickname
+           passed to connect(). The file is only readable by its owner.
+           Any object with the same load/store/forget methods can be used
+           instead, e.g. to keep the sessions in a database.
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        self._data = None
+
+    def _read(self):
+        if self._data is None:
+            self._data = read_json_file(self._path, 'session store')
+        return self._data
+
+    def _write(self):
+        write_json_file(self._path, self._data, 'session store')
+
+    def load(self, host):
+        """Return the session saved for host, or None."""
+        with self._lock:
+            session = self._read().get(host)
+            return dict(session) if session is not None else None
+
+    def store(self, host, cookies, clientid, nickname):
+        """Save the cookies obtained by registering clientid on host."""
+        with self._lock:
+            self._read()[host] = {'cookies': dict(cookies),
+                                  'clientid': clientid,
+                                  'nickname': nickname,
+                                  'timestamp': time.time()}
+            self._write()
+
+    def forget(self, host):
+        """Drop the session of host."""
+        with self._lock:
+            if self._read().pop(host, None) is not None:
+                self._write()
@@ -0,0 +1,37 @@
+"""
+Deduplication of concurrent identical calls.
+"""
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight(object):
+
+    def __init__(self):
+        """Share one execution of a call between the threads making it at
+           the same time: the first caller runs it, the others wait for
+           its result or exception. Nothing is cached once it returns."""
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, function, *args, **kwargs):
+        """Call function, or wait for the call in flight under key."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as exception_instance:
+            future.set_exception(exception_instance)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
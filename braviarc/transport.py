@@ -0,0 +1,279 @@
+"""
+HTTP transports of BraviaRC.
+
+RequestsTransport sends the requests through a pooled requests.Session,
+imported only when the transport is created. HTTPClientTransport keeps
+connections alive with http.client alone, for small controllers where
+importing requests is too slow or too large.
+"""
+import base64
+import collections
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+from .models import loads
+
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 10
+DEFAULT_TRANSPORT = 'requests'
+
+
+class TransportError(IOError):
+    """The request could not be sent or its response was not received."""
+
+
+class Timeout(TransportError):
+    """The TV did not accept the connection or answer in time."""
+
+
+class HTTPError(TransportError):
+    """Raised by Response.raise_for_status for HTTP 4xx and 5xx."""
+
+
+class Response(object):
+    """HTTP response of a transport, with the attributes BraviaRC uses."""
+
+    __slots__ = ('status_code', 'content', 'headers', 'cookies', 'elapsed',
+                 'url')
+
+    def __init__(self, status_code, content, headers, cookies, elapsed, url):
+        self.status_code = status_code
+        self.content = content
+        # case-insensitive mapping
+        self.headers = headers
+        self.cookies = cookies
+        # seconds until the response headers were received
+        self.elapsed = elapsed
+        self.url = url
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise HTTPError('{} Error for url: {}'.format(self.status_code,
+                                                          self.url))
+
+    def json(self):
+        return loads(self.content)
+
+
+def create_session(pool_connections=POOL_CONNECTIONS,
+                   pool_maxsize=POOL_MAXSIZE):
+    """Create a pooled keep-alive requests session.
+
+       The session can be passed to several BraviaRC instances so that they
+       share the same connection pool. pool_connections is the number of
+       hosts kept in the pool and pool_maxsize the number of connections
+       kept alive per host.
+    """
+    import requests
+    import requests.adapters
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_connections,
+                                            pool_maxsize=pool_maxsize)
+    session.mount('http://', adapter)
+    return session
+
+
+class RequestsTransport(object):
+
+    def __init__(self, session=None, pool_connections=POOL_CONNECTIONS,
+                 pool_maxsize=POOL_MAXSIZE):
+        """Send the requests with session, see create_session.
+
+           A private session is created without one and closed by close().
+        """
+        import requests
+
+        self._exceptions = requests.exceptions
+        self._cookies_dict = requests.utils.dict_from_cookiejar
+        self._owns_session = session is None
+        if session is None:
+            session = create_session(pool_connections, pool_maxsize)
+        self.session = session
+
+    def request(self, method, url, data=None, headers=None, cookies=None,
+                auth=None, timeout=None):
+        try:
+            response = self.session.request(method, url, data=data,
+                                            headers=headers, cookies=cookies,
+                                            auth=auth, timeout=timeout)
+        except self._exceptions.Timeout as exception_instance:
+            raise Timeout(str(exception_instance)) from exception_instance
+        except self._exceptions.RequestException as exception_instance:
+            raise TransportError(str(exception_instance)) \
+                from exception_instance
+        return Response(response.status_code, response.content,
+                        response.headers,
+                        self._cookies_dict(response.cookies),
+                        response.elapsed.total_seconds(), url)
+
+    def close(self):
+        if self._owns_session:
+            self.session.close()
+
+
+class HTTPClientTransport(object):
+
+    def __init__(self, pool_connections=POOL_CONNECTIONS,
+                 pool_maxsize=POOL_MAXSIZE, unix_socket=None):
+        """Send the requests with http.client over keep-alive connections.
+
+           Up to pool_maxsize idle connections are kept per host, for the
+           pool_connections hosts used most recently. A request failing on
+           a connection closed by the TV while idle is sent again once on a
+           new connection.
+
+           With unix_socket every connection is made to that path, e.g. a
+           BraviaProxy, and the host of the URL is only sent as Host.
+        """
+        import http.client
+        import http.cookies
+
+        self._client = http.client
+        self._cookies = http.cookies
+        self._unix_socket = unix_socket
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._lock = threading.Lock()
+        # (scheme, netloc): idle connections, least recently used first
+        self._idle = collections.OrderedDict()
+
+    def _get_connection(self, key):
+        """Return (connection, whether it was used before)."""
+        with self._lock:
+            connections = self._idle.get(key)
+            if connections:
+                return connections.pop(), True
+        if key[0] == 'https':
+            return self._client.HTTPSConnection(key[1]), False
+        return self._client.HTTPConnection(key[1]), False
+
+    def _put_connection(self, key, connection):
+        closed = []
+        with self._lock:
+            connections = self._idle.setdefault(key, [])
+            self._idle.move_to_end(key)
+            if len(connections) < self._pool_maxsize:
+                connections.append(connection)
+            else:
+                closed.append(connection)
+            while len(self._idle) > self._pool_connections:
+                closed.extend(self._idle.popitem(last=False)[1])
+        for connection in closed:
+            connection.close()
+
+    def _connect(self, connection, timeout):
+        if self._unix_socket is None:
+            connection.timeout = timeout
+            connection.connect()
+            return
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(timeout)
+            sock.connect(self._unix_socket)
+        except OSError:
+            sock.close()
+            raise
+        connection.sock = sock
+
+    def _build_headers(self, headers, cookies, auth):
+        headers = dict(headers or {})
+        if cookies:
+            headers['Cookie'] = '; '.join(
+                '{}={}'.format(key, value) for key, value in cookies.items())
+        if auth is not None:
+            headers['Authorization'] = 'Basic ' + base64.b64encode(
+                '{}:{}'.format(*auth).encode('utf-8')).decode('ascii')
+        return headers
+
+    def request(self, method, url, data=None, headers=None, cookies=None,
+                auth=None, timeout=None):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        headers = self._build_headers(headers, cookies, auth)
+        if isinstance(timeout, tuple):
+            connect_timeout, read_timeout = timeout
+        else:
+            connect_timeout = read_timeout = timeout
+
+        while True:
+            connection, reused = self._get_connection(key)
+            start = time.monotonic()
+            try:
+                if connection.sock is None:
+                    self._connect(connection, connect_timeout)
+                connection.sock.settimeout(read_timeout)
+                connection.request(method, path, body=data, headers=headers)
+                response = connection.getresponse()
+                elapsed = time.monotonic() - start
+                content = response.read()
+            except socket.timeout as exception_instance:
+                connection.close()
+                raise Timeout('{}: {}'.format(url, exception_instance)) \
+                    from exception_instance
+            except (ConnectionResetError, BrokenPipeError) as exception_instance:
+                # includes http.client.RemoteDisconnected
+                connection.close()
+                if reused:
+                    continue
+                raise TransportError('{}: {}'.format(
+                    url, exception_instance)) from exception_instance
+            except (OSError, self._client.HTTPException) as \
+                    exception_instance:
+                connection.close()
+                raise TransportError('{}: {}'.format(
+                    url, exception_instance)) from exception_instance
+            break
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._put_connection(key, connection)
+        return Response(response.status, content, response.msg,
+                        self._parse_cookies(response.msg), elapsed, url)
+
+    def _parse_cookies(self, headers):
+        cookies = {}
+        for header in headers.get_all('Set-Cookie') or ():
+            cookie = self._cookies.SimpleCookie()
+            try:
+                cookie.load(header)
+            except self._cookies.CookieError:
+                continue
+            for key, morsel in cookie.items():
+                cookies[key] = morsel.value
+        return cookies
+
+    def close(self):
+        """Close the idle connections."""
+        with self._lock:
+            idle = list(self._idle.values())
+            self._idle.clear()
+        for connections in idle:
+            for connection in connections:
+                connection.close()
+
+
+TRANSPORTS = {
+    'requests': RequestsTransport,
+    'http.client': HTTPClientTransport,
+}
+
+
+def create_transport(name=DEFAULT_TRANSPORT,
+                     pool_connections=POOL_CONNECTIONS,
+                     pool_maxsize=POOL_MAXSIZE):
+    """Create the transport named 'requests' or 'http.client'."""
+    try:
+        factory = TRANSPORTS[name]
+    except KeyError:
+        raise ValueError('Unknown transport: {!r}'.format(name))
+    return factory(pool_connections=pool_connections,
+                   pool_maxsize=pool_maxsize)
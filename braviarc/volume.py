@@ -0,0 +1,229 @@
+"""
+Coalesced and ramped volume control of a Sony Bravia TV.
+"""
+import logging
+import threading
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+MAX_RATE = 10
+SYNC_INTERVAL = 60
+# volume steps of a level of 1, see set_volume_level
+MAX_VOLUME = 100
+
+
+class VolumeController(object):
+
+    def __init__(self, tv, max_rate=MAX_RATE, sync_interval=SYNC_INTERVAL):
+        """Control the volume of a BraviaRC from a background thread.
+
+           set() and step() return at once: while a request is in flight
+           newer values replace the pending one, so that only the latest
+           is sent, and at most max_rate requests are sent per second.
+           ramp() fades the volume over a duration at the same rate.
+
+           The volume and mute state are tracked locally from the requests
+           that succeeded and reconciled with get_volume_info by sync(),
+           after a failed request and once older than sync_interval.
+           Volumes are levels in the range 0..1, as for set_volume_level.
+        """
+        self._tv = tv
+        self._min_interval = 1.0 / max_rate
+        self._sync_interval = sync_interval
+        self._condition = threading.Condition()
+        self._volume = None
+        self._muted = None
+        self._synced = None
+        # pending changes: volume in TV steps, mute, (start, end, t0, t1)
+        self._target = None
+        self._mute = None
+        self._ramp = None
+        self._busy = False
+        self._next_send = 0
+        self._thread = None
+        self._running = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def volume(self):
+        """Last known level, None if unknown."""
+        if self._volume is None:
+            return None
+        return self._volume / float(MAX_VOLUME)
+
+    @property
+    def muted(self):
+        return self._muted
+
+    def reconcile(self, volume_info):
+        """Update the tracked state from a VolumeInfo, e.g. a notification."""
+        if not volume_info:
+            return
+        with self._condition:
+            self._volume = volume_info.get('volume')
+            self._muted = volume_info.get('mute')
+            self._synced = time.monotonic()
+
+    def sync(self):
+        """Fetch the volume from the TV and return the level."""
+        self.reconcile(self._tv.get_volume_info())
+        return self.volume
+
+    def _stale(self):
+        return self._synced is None or \
+            time.monotonic() - self._synced >= self._sync_interval
+
+    def _steps(self, level):
+        return max(0, min(MAX_VOLUME,
+                          int(round(level * MAX_VOLUME))))
+
+    def set(self, level):
+        """Set the volume level, replacing pending changes and ramps."""
+        with self._condition:
+            self._target = self._steps(level)
+            self._ramp = None
+            self._wake_locked()
+
+    def step(self, delta):
+        """Change the volume by delta levels from the latest target."""
+        if self._volume is None or self._stale():
+            self.sync()
+        with self._condition:
+            if self._ramp is not None:
+                current = self._ramp[1]
+            elif self._target is not None:
+                current = self._target
+            else:
+                current = self._volume or 0
+            self._target = max(0, min(MAX_VOLUME, current + int(
+                round(delta * MAX_VOLUME))))
+            self._ramp = None
+            self._wake_locked()
+
+    def mute(self, mute=True):
+        with self._condition:
+            self._mute = bool(mute)
+            self._wake_locked()
+
+    def ramp(self, level, duration):
+        """Fade the volume to level over duration seconds."""
+        if self._volume is None or self._stale():
+            self.sync()
+        with self._condition:
+            start = self._target if self._target is not None else \
+                self._volume or 0
+            now = time.monotonic()
+            self._target = None
+            self._ramp = (start, self._steps(level), now, now + duration)
+            self._wake_locked()
+
+    def wait(self, timeout=None):
+        """Wait until every pending change was sent, False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._busy and not self._pending_locked(),
+                timeout)
+
+    def close(self):
+        """Stop the background thread, pending changes are dropped."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _wake_locked(self):
+        if not self._running:
+            self._running = True
+            self._thread = threading.Thread(target=self._run,
+                                            name='VolumeController')
+            self._thread.daemon = True
+            self._thread.start()
+        self._condition.notify_all()
+
+    def _pending_locked(self):
+        return self._mute is not None or self._target is not None or \
+            self._ramp is not None
+
+    def _next_change_locked(self, now):
+        """Return the next (kind, value) to send, or None to wait."""
+        if self._mute is not None:
+            mute, self._mute = self._mute, None
+            if mute != self._muted:
+                return 'mute', mute
+        if self._ramp is not None:
+            start, end, begin, finish = self._ramp
+            if now >= finish:
+                self._ramp = None
+                value = end
+            else:
+                value = int(round(start + (end - start) *
+                                  (now - begin) / (finish - begin)))
+            if value != self._volume:
+                return 'volume', value
+            return None
+        if self._target is not None:
+            value, self._target = self._target, None
+            if value != self._volume:
+                return 'volume', value
+        return None
+
+    def _send(self, kind, value):
+        try:
+            if kind == 'mute':
+                resp = self._tv.set_mute(value)
+            else:
+                resp = self._tv.set_volume_level(
+                    value / float(MAX_VOLUME))
+        except Exception as exception_instance:  # pylint: disable=broad-except
+            _LOGGER.debug("Setting %s failed: %s", kind, exception_instance)
+            return False
+        return resp is not None and not resp.get('error')
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if not self._running:
+                        return
+                    now = time.monotonic()
+                    if self._pending_locked() and now >= self._next_send:
+                        change = self._next_change_locked(now)
+                        if change is not None:
+                            break
+                        if self._pending_locked():
+                            # ramp step not due yet
+                            self._next_send = now + self._min_interval
+                    self._condition.notify_all()
+                    timeout = None
+                    if self._pending_locked():
+                        timeout = max(0, self._next_send - now)
+                    self._condition.wait(timeout)
+                self._busy = True
+
+            kind, value = change
+            ok = self._send(kind, value)
+            with self._condition:
+                self._busy = False
+                self._next_send = time.monotonic() + self._min_interval
+                if ok:
+                    if kind == 'mute':
+                        self._muted = value
+                    else:
+                        self._volume = value
+                else:
+                    self._synced = None
+                self._condition.notify_all()
+            if not ok:
+                try:
+                    self.sync()
+                except Exception as exception_instance:  # pylint: disable=broad-except
+                    _LOGGER.debug("Volume sync failed: %s",
+                                  exception_instance)
@@ -18,6 +18,8 @@ setup(name='braviarc',
       version='0.3.7',
       description=open(os.path.join(CURRENT_DIR, 'README.md')).read(),
       install_requires=['requests'],
+      extras_require={'async': ['aiohttp'], 'fast': ['orjson']},
+      entry_points={'console_scripts': ['braviarc = braviarc.cli:main']},
       maintainer='Antonio Parraga',
       maintainer_email='antonio@parraga.es',
       zip_safe=False,
@@ -0,0 +1,56 @@
+"""
+Recovery of the circuit breaker of BraviaRC against FakeBraviaDevice.
+"""
+import time
+import unittest
+
+from braviarc.braviarc import BraviaRC
+from braviarc.fake_device import FakeBraviaDevice
+from braviarc.policy import CircuitBreaker
+from braviarc.transport import HTTPClientTransport
+
+
+class FailingTransport(HTTPClientTransport):
+    """Raises error on the next request."""
+
+    error = None
+
+    def request(self, *args, **kwargs):  # pylint: disable=arguments-differ
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
+        return super(FailingTransport, self).request(*args, **kwargs)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.device = FakeBraviaDevice(psk='0000')
+        self.device.start()
+        self.addCleanup(self.device.stop)
+        self.transport = FailingTransport()
+        self.addCleanup(self.transport.close)
+        self.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+        self.tv = BraviaRC(self.device.host, psk='0000', response_cache=False,
+                           circuit_breaker=self.breaker,
+                           transport=self.transport)
+        self.addCleanup(self.tv.close)
+        self.breaker.record_failure()
+        time.sleep(0.15)
+
+    def test_deadline_before_the_trial_request(self):
+        with self.tv.deadline(0.0001):
+            time.sleep(0.001)
+            self.assertEqual(self.tv.get_power_status(), 'off')
+        self.assertEqual(self.tv.get_power_status(), 'active')
+        self.assertFalse(self.breaker.is_open)
+
+    def test_trial_request_aborted_by_the_transport(self):
+        self.transport.error = RuntimeError('aborted')
+        self.assertEqual(self.tv.get_power_status(), 'off')
+        self.assertEqual(self.tv.get_power_status(), 'active')
+        self.assertFalse(self.breaker.is_open)
+
+
+if __name__ == '__main__':
+    unittest.main()
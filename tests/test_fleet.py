@@ -0,0 +1,41 @@
+"""
+Per-host results of BraviaFleet against FakeBraviaDevice.
+"""
+import unittest
+
+from braviarc.fake_device import FakeBraviaDevice
+from braviarc.fleet import BraviaFleet
+
+
+class BraviaFleetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.device = FakeBraviaDevice(psk='0000')
+        self.device.start()
+        self.addCleanup(self.device.stop)
+        self.fleet = BraviaFleet(deadline=5)
+        self.addCleanup(self.fleet.close)
+
+    def test_ok(self):
+        self.fleet.add(self.device.host, psk='0000')
+        result = self.fleet.set_volume_level(0.3)[self.device.host]
+        self.assertTrue(result.ok)
+        self.assertTrue(self.fleet.send_command('Home')[self.device.host].ok)
+
+    def test_json_rpc_error(self):
+        self.device.errors['setAudioVolume'] = [403, 'Forbidden']
+        self.fleet.add(self.device.host, psk='0000')
+        result = self.fleet.set_volume_level(0.3)[self.device.host]
+        self.assertFalse(result.ok)
+        self.assertIn('Forbidden', str(result.error))
+
+    def test_ircc_http_error(self):
+        self.fleet.add(self.device.host, psk='wrong')
+        result = self.fleet.call('send_req_ircc',
+                                 'AAAAAQAAAAEAAABgAw==')[self.device.host]
+        self.assertFalse(result.ok)
+        self.assertIn('403', str(result.error))
+
+
+if __name__ == '__main__':
+    unittest.main()
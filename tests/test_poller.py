@@ -0,0 +1,49 @@
+"""
+Scheduling of BraviaPoller against FakeBraviaDevice.
+"""
+import time
+import unittest
+
+from braviarc.braviarc import BraviaRC
+from braviarc.fake_device import FakeBraviaDevice
+from braviarc.poller import BraviaPoller
+
+
+class BraviaPollerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.device = FakeBraviaDevice(psk='0000')
+        self.device.start()
+        self.addCleanup(self.device.stop)
+        self.tv = BraviaRC(self.device.host, psk='0000',
+                           response_cache=False)
+        self.addCleanup(self.tv.close)
+
+    def polls(self):
+        return sum(1 for _, kind, name in self.device.calls
+                   if (kind, name) == ('JSON', 'getPowerStatus'))
+
+    def test_pokes_keep_one_poll_per_interval(self):
+        with BraviaPoller([self.tv], interval=1, fast_interval=1) as poller:
+            time.sleep(0.2)
+            for _ in range(5):
+                poller.poke(self.tv._host)  # pylint: disable=protected-access
+            time.sleep(3)
+            # polled at 0, 1, 2 and 3 seconds
+            self.assertLessEqual(self.polls(), 4)
+            self.assertGreaterEqual(self.polls(), 3)
+
+    def test_poke_moves_the_poll_forward(self):
+        with BraviaPoller([self.tv], interval=30,
+                          fast_interval=0.1) as poller:
+            time.sleep(0.3)
+            self.assertEqual(self.polls(), 1)
+            poller.poke(self.tv._host)  # pylint: disable=protected-access
+            time.sleep(0.3)
+            # then every fast_interval
+            self.assertGreaterEqual(self.polls(), 3)
+            self.assertLessEqual(self.polls(), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+"""
+BraviaProxy against FakeBraviaDevice.
+"""
+import time
+import unittest
+
+from braviarc.braviarc import BraviaRC
+from braviarc.fake_device import FakeBraviaDevice
+from braviarc.proxy import BraviaProxy
+
+
+class BraviaProxyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.device = FakeBraviaDevice(psk='0000')
+        self.device.start()
+        self.addCleanup(self.device.stop)
+        # every poll reaches the TV
+        self.proxy = BraviaProxy({'living': {'host': self.device.host,
+                                             'psk': '0000',
+                                             'response_cache': False}},
+                                 address=('127.0.0.1', 0), poll_interval=2)
+        self.proxy.start()
+        self.addCleanup(self.proxy.stop)
+        self.tv = BraviaRC(self.proxy.url('living'))
+        self.addCleanup(self.tv.close)
+
+    def test_commands_do_not_raise_the_poll_rate(self):
+        for volume in range(12):
+            self.tv.set_volume_level(volume / 100.0)
+            time.sleep(0.5)
+        self.assertEqual(self.device.volume, 11)
+        polls = sum(1 for _, kind, name in self.device.calls
+                    if (kind, name) == ('JSON', 'getPowerStatus'))
+        # polled at 0, 2, 4 and 6 seconds, every second once poked
+        # without the poll_interval limit
+        self.assertLessEqual(polls, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Concurrent use of one BraviaRC instance against FakeBraviaDevice.
+"""
+import collections
+import threading
+import unittest
+
+from braviarc.braviarc import BraviaRC
+from braviarc.fake_device import FakeBraviaDevice
+
+THREADS = 20
+
+
+class ThreadSafetyTest(unittest.TestCase):
+
+    def setUp(self):
+        # latency keeps the first request in flight while the threads start
+        self.device = FakeBraviaDevice(psk='0000', channels=120, latency=0.05)
+        self.device.start()
+        self.addCleanup(self.device.stop)
+
+    def requests(self, call):
+        """Return the results of call on a fresh instance from THREADS
+           threads at once and the requests the TV received."""
+        tv = BraviaRC(self.device.host, psk='0000', pool_maxsize=THREADS)
+        self.addCleanup(tv.close)
+        del self.device.calls[:]
+        barrier = threading.Barrier(THREADS)
+        results = []
+
+        def run():
+            barrier.wait()
+            results.append(call(tv))
+
+        threads = [threading.Thread(target=run) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, collections.Counter(
+            (kind, name) for _, kind, name in self.device.calls)
+
+    def test_get_command_code(self):
+        results, calls = self.requests(
+            lambda tv: tv.get_command_code('Home'))
+        self.assertEqual(len(set(results)), 1)
+        self.assertIsNotNone(results[0])
+        self.assertEqual(calls, {('JSON', 'getRemoteControllerInfo'): 1})
+
+    def test_load_source_list(self):
+        results, calls = self.requests(
+            lambda tv: len(tv.load_source_list()))
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(calls[('JSON', 'getSourceList')], 2)
+        self.assertEqual(calls[('JSON', 'getContentCount')], 1)
+        self.assertEqual(calls[('JSON', 'getApplicationList')], 1)
+        # 120 channels in 3 pages and the inputs
+        self.assertEqual(calls[('JSON', 'getContentList')], 4)
+
+    def test_start_app(self):
+        results, calls = self.requests(
+            lambda tv: tv.start_app('Netflix') is not None)
+        self.assertEqual(set(results), {True})
+        self.assertEqual(calls[('DIAL', '/DIAL/sony/applist')], 1)
+        self.assertEqual(calls[('JSON', 'getApplicationList')], 1)
+        self.assertEqual(calls[('DIAL', '/DIAL/apps/com.sony.dtv.netflix')],
+                         THREADS)
+
+
+if __name__ == '__main__':
+    unittest.main()